@@ -1,10 +1,19 @@
 import datetime
 import difflib
+import itertools
 import logging
 import os
+import re
+import sys
+import time
+import types
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional, Tuple, List, Dict
 from agent.event_bus import publish_event
+from agent.utils import dumps_json, get_openai_client, llm_cached
 
 try:
     from termcolor import cprint
@@ -17,14 +26,13 @@ try:
 
     load_dotenv()
     OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
-    if OPENAI_API_KEY:
-        openai.api_key = OPENAI_API_KEY
-    else:
+    client = get_openai_client(OPENAI_API_KEY)
+    if not OPENAI_API_KEY:
         cprint("[ERROR] OPENAI_API_KEY not set in environment.", "red")
-except Exception as e
-    publish_event('error', {'agent': 'app_upgrade_executor', 'error': str(e), 'timestamp': datetime.now().isoformat()})  # [event_bus hook]
-:
+except Exception as e:
+    publish_event('error', {'agent': 'app_upgrade_executor', 'error': str(e), 'timestamp': datetime.datetime.now().isoformat()})  # [event_bus hook]
     openai = None
+    client = None
     cprint(f"[ERROR] OpenAI not configured: {e}", "red")
 
 logging.basicConfig(
@@ -33,9 +41,42 @@ logging.basicConfig(
 
 REPORTS_DIR = Path("logs/perfection_reports")
 BACKUP_ROOT = Path("logs/agent_backups/app_upgrades")
+PATCH_PREFETCH = 4
+
+# Backup suffix: session start time plus a per-session sequence number (sortable, unique).
+_START = time.strftime("%Y%m%d_%H%M%S")
+_seq = itertools.count()
+_BACKUP_SUFFIX_RE = re.compile(r"_\d{8}_\d{6}(?:_\d+)?\.bak$")
 REPORTS_DIR.mkdir(parents=True, exist_ok=True)
 BACKUP_ROOT.mkdir(parents=True, exist_ok=True)
 
+_CODE_EXTS = frozenset({
+    ".py", ".js", ".ts", ".json", ".yaml", ".yml",
+    ".env", ".md", ".toml"
+})
+
+# Numbered ("1.") or bulleted ("-") suggestion lines; group 1 is the item text.
+_UPGRADE_RE = re.compile(r"^[^\S\n]*[\d-][\d.\- \t]*(.+?)[^\S\n]*$", re.MULTILINE)
+
+# Reply format requested by llm_apply_patch: Filename / Explanation / Summary / Code block.
+_PATCH_RE = re.compile(
+    r"Filename:[ \t]*(?P<fname>[^\n]*)\n.*?"
+    r"Explanation:\s*(?P<exp>.*?)"
+    r"Summary:\s*(?P<sum>.*?)"
+    r"Code:.*?```(?:python)?\s*(?P<code>.*?)```",
+    re.DOTALL,
+)
+
+@lru_cache(maxsize=32)
+def _split_lines(code: str) -> Tuple[str, ...]:
+    # The same pre-upgrade file is often diffed against several candidate patches.
+    return tuple(code.splitlines())
+
+@lru_cache(maxsize=128)
+def _compile_source(source: str, filename: str):
+    # Identical patch text (cached LLM replies, re-applied upgrades) is only parsed once.
+    return compile(source, filename, "exec")
+
 class Planner:
     """
     Planner agent for interactive app goal decomposition, upgrade planning, and more.
@@ -51,45 +92,46 @@ class Planner:
     def read_all_code(self, app_path: str) -> Dict[str, str]:
         """
         Collect all code, config, and docs in app directory recursively as text.
+        Paths are enumerated first, then read concurrently so disk I/O overlaps.
         """
         file_data = {}
         app_path = Path(app_path)
+        paths = []
         for path in app_path.rglob("*"):
-            if path.suffix.lower() in {
-                ".py", ".js", ".ts", ".json", ".yaml", ".yml",
-                ".env", ".md", ".toml"
-            }:
-                try:
-                    rel_path = path.relative_to(app_path)
-                    file_data[str(rel_path)] = path.read_text(
-                        encoding="utf-8", errors="ignore"
-                    )
-                except Exception as e
-    publish_event('error', {'agent': 'app_upgrade_executor', 'error': str(e), 'timestamp': datetime.now().isoformat()})  # [event_bus hook]
-:
-                    logging.warning(f"Could not read {path}: {e}")
+            suffix = path.suffix
+            # Suffixes are almost always lowercase already; only fold case on a miss.
+            if suffix in _CODE_EXTS or suffix.lower() in _CODE_EXTS:
+                paths.append(path)
+
+        def read_one(path: Path) -> Tuple[Path, Optional[str]]:
+            try:
+                return path, path.read_text(encoding="utf-8", errors="ignore")
+            except Exception as e:
+                publish_event('error', {'agent': 'app_upgrade_executor', 'error': str(e), 'timestamp': datetime.datetime.now().isoformat()})  # [event_bus hook]
+                logging.warning(f"Could not read {path}: {e}")
+                return path, None
+
+        with ThreadPoolExecutor(max_workers=(os.cpu_count() or 1) * 4) as executor:
+            for path, text in executor.map(read_one, paths):
+                if text is not None:
+                    file_data[str(path.relative_to(app_path))] = text
         return file_data
 
     def enumerate_upgrades(self, suggestions: str) -> List[str]:
         """
         Parse upgrade suggestions list from LLM output.
         """
-        upgrades = []
-        for line in suggestions.split("\n"):
-            line = line.strip()
-            if line and (line[0].isdigit() or line.startswith("-")):
-                upgrades.append(line.lstrip("0123456789.- ").strip())
-        return upgrades
+        return _UPGRADE_RE.findall(suggestions)
 
     def show_diff(self, old: str, new: str, fname: str) -> None:
-        diff = difflib.unified_diff(
-            old.splitlines(),
+        for line in difflib.unified_diff(
+            _split_lines(old),
             new.splitlines(),
             fromfile=f"{fname} (old)",
             tofile=f"{fname} (new)",
             lineterm="",
-        )
-        cprint("\n".join(diff), "blue")
+        ):
+            cprint(line, "blue")
 
     def ask_user(self, prompt: str) -> str:
         cprint(f"\n{prompt} [y/n/skip/quit/all]: ", "yellow", end="")
@@ -99,18 +141,17 @@ class Planner:
         """
         Run LLM analysis of app for perfection suggestions.
         """
-        if not openai:
+        if not client:
             cprint("[ERROR] OpenAI client not configured.", "red")
             return ""
 
         app_path = self.apps_base_dir / app_name
         all_files = self.read_all_code(app_path)
-        big_text = "\n\n".join(
-            [
-                f"\n# {fname}\n{content[:2000]}"
-                for fname, content in list(all_files.items())[:25]
-            ]
-        )
+        parts = []
+        for fname, content in itertools.islice(all_files.items(), 25):
+            snippet = content if len(content) <= 2000 else content[:2000]
+            parts.append(f"\n# {fname}\n{snippet}")
+        big_text = "\n\n".join(parts)
 
         prompt = (
             "You are an expert multi-domain app reviewer AI. Deeply analyze this app, "
@@ -120,35 +161,36 @@ class Planner:
             f"{big_text}\n\n"
         )
         try:
-            resp = openai.ChatCompletion.create(
-                model="gpt-4o",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=max_tokens,
-                temperature=0.15,
+            return llm_cached(
+                client.chat.completions.create, prompt,
+                model="gpt-4o", max_tokens=max_tokens, temperature=0.15,
+                stream_to=sys.stdout,
             )
-            text = resp.choices[0].message.content
-            return text
-        except Exception as e
-    publish_event('error', {'agent': 'app_upgrade_executor', 'error': str(e), 'timestamp': datetime.now().isoformat()})  # [event_bus hook]
-:
+        except Exception as e:
+            publish_event('error', {'agent': 'app_upgrade_executor', 'error': str(e), 'timestamp': datetime.datetime.now().isoformat()})  # [event_bus hook]
             cprint(f"[ERROR] LLM analysis failed: {e}", "red")
             return ""
 
     def llm_apply_patch(
-        self, app_path: str, upgrade_suggestion: str
+        self, app_path: str, upgrade_suggestion: str, current_code: Optional[Tuple[str, str]] = None
     ) -> Tuple[Optional[str], Optional[str], Optional[str], Optional[str]]:
         """
         Use LLM to generate code patch for an upgrade suggestion.
+        current_code=(filename, text) asks for the patch on top of that file's present contents.
         Returns (filename, new_code, explanation, summary) or (None, None, None, None) if fail.
         """
-        if not openai:
+        if not client:
             cprint("[ERROR] OpenAI client not configured.", "red")
             return None, None, None, None
 
         prompt = (
             f"Given the app at {app_path}, implement the following upgrade in the minimal, "
             f"world-class way:\n{upgrade_suggestion}\n"
-            "Reply ONLY in this format:\n"
+            + (
+                f"Current contents of {current_code[0]} (keep its earlier upgrades):\n```python\n{current_code[1]}\n```\n"
+                if current_code else ""
+            )
+            + "Reply ONLY in this format:\n"
             "Filename: <filename>\n"
             "Explanation:\n"
             "<Short explanation of why and how the upgrade was made, line by line>\n"
@@ -158,39 +200,17 @@ class Planner:
             "```python\n<code here>\n```"
         )
         try:
-            resp = openai.ChatCompletion.create(
-                model="gpt-4o",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=3000,
-                temperature=0.1,
+            reply = llm_cached(
+                client.chat.completions.create, prompt,
+                model="gpt-4o", max_tokens=3000, temperature=0.1,
             )
-            reply = resp.choices[0].message.content
-
-            fname = None
-            explanation = ""
-            new_code = None
-            summary = ""
-
-            if "Filename:" in reply:
-                parts = reply.split("Filename:")[1].split("\n", 1)
-                fname = parts[0].strip()
-                rest = parts[1] if len(parts) > 1 else ""
-                if "Explanation:" in rest:
-                    exp_part = rest.split("Explanation:")[1]
-                    if "Summary:" in exp_part:
-                        explanation = exp_part.split("Summary:")[0].strip()
-                        sum_part = exp_part.split("Summary:")[1]
-                        if "Code:" in sum_part:
-                            summary = sum_part.split("Code:")[0].strip()
-                            code_part = sum_part.split("Code:")[1]
-                            if "```python" in code_part:
-                                new_code = (
-                                    code_part.split("```python")[1].split("```")[0].strip()
-                                )
-            return fname, new_code, explanation, summary
-        except Exception as e
-    publish_event('error', {'agent': 'app_upgrade_executor', 'error': str(e), 'timestamp': datetime.now().isoformat()})  # [event_bus hook]
-:
+
+            m = _PATCH_RE.search(reply)
+            if not m:
+                return None, None, None, None
+            return m["fname"].strip(), m["code"].strip(), m["exp"].strip(), m["sum"].strip()
+        except Exception as e:
+            publish_event('error', {'agent': 'app_upgrade_executor', 'error': str(e), 'timestamp': datetime.datetime.now().isoformat()})  # [event_bus hook]
             cprint(f"[ERROR] LLM patch generation failed: {e}", "red")
             return None, None, None, None
 
@@ -206,78 +226,109 @@ class Planner:
         rollbacks = []
         session_summaries = []
 
-        for upgrade in upgrades:
-            cprint(f"\n=== Suggested Upgrade: ===\n{upgrade}", "cyan")
-            fname, new_code, explanation, summary = self.llm_apply_patch(app_path, upgrade)
-            if fname and new_code:
-                target_path = app_path / fname
-                # Dedicated backup in backup dir
-                backup_dir = BACKUP_ROOT / app_path.name
-                backup_dir.mkdir(parents=True, exist_ok=True)
-                backup_path = backup_dir / f"{fname}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.bak"
-                old_code = target_path.read_text(encoding="utf-8") if target_path.exists() else ""
-                if target_path.exists():
-                    backup_path.write_text(old_code, encoding="utf-8")
-                cprint(f"\n--- AI Explanation of Upgrade ---\n{explanation}", "magenta")
-                cprint(f"\n--- Plain Summary ---\n{summary}", "yellow")
-                self.show_diff(old_code, new_code, fname)
-                resp = self.ask_user(f"Apply this upgrade to {fname}?")
-                if resp in ("y", "yes", "all"):
-                    target_path.write_text(new_code, encoding="utf-8")
-                    cprint(f"[OK] Upgrade applied to {fname}!", "green")
-                    applied.append(fname)
-                    # Self-test
-                    try:
-                        import importlib.util
-                        spec = importlib.util.spec_from_file_location(
-                            fname.replace(".py", ""), str(target_path)
-                        )
-                        mod = importlib.util.module_from_spec(spec)
-                        spec.loader.exec_module(mod)
-                        if hasattr(mod, "self_test"):
-                            cprint(f"[INFO] Running self_test for {fname}...", "blue")
-                            result = mod.self_test()
-                            if not result:
-                                cprint(
-                                    f"[FAIL] Self-test failed. Rolling back {fname}.", "red"
-                                )
-                                target_path.write_text(old_code, encoding="utf-8")
-                                rollbacks.append(fname)
-                            else:
-                                cprint(f"[PASS] Self-test passed for {fname}.", "green")
-                    except Exception as e
-    publish_event('error', {'agent': 'app_upgrade_executor', 'error': str(e), 'timestamp': datetime.now().isoformat()})  # [event_bus hook]
-:
-                        cprint(f"[FAIL] Error during self-test: {e}", "red")
-                        target_path.write_text(old_code, encoding="utf-8")
-                        rollbacks.append(fname)
-                    # Update README.md doc with explanation
-                    readme = app_path / "README.md"
-                    if readme.exists():
-                        current = readme.read_text(encoding="utf-8")
-                        readme.write_text(
-                            current + f"\n\n# Upgrade: {upgrade}\n{explanation}\n", encoding="utf-8"
-                        )
-                    session_summaries.append({"file": fname, "summary": summary, "explanation": explanation})
-                elif resp == "quit":
-                    break
+        backup_dir = BACKUP_ROOT / app_path.name
+        ensured_dirs = set()
+
+        # Generate up to PATCH_PREFETCH patches ahead of the user so LLM latency hides behind
+        # review time. written lists every file this session rewrote, in order, so a patch can
+        # tell whether its target changed after it was submitted.
+        written: List[str] = []
+        pending = deque()
+        upgrade_iter = iter(upgrades)
+        executor = ThreadPoolExecutor(max_workers=PATCH_PREFETCH)
+
+        def submit_next() -> None:
+            upgrade = next(upgrade_iter, None)
+            if upgrade is not None:
+                pending.append((upgrade, executor.submit(self.llm_apply_patch, app_path, upgrade), len(written)))
+
+        try:
+            for _ in range(PATCH_PREFETCH):
+                submit_next()
+            while pending:
+                upgrade, patch, submitted_at = pending.popleft()
+                submit_next()
+                cprint(f"\n=== Suggested Upgrade: ===\n{upgrade}", "cyan")
+                fname, new_code, explanation, summary = patch.result()
+                if fname and new_code and fname in written[submitted_at:]:
+                    # An earlier upgrade rewrote this file: rebuild the patch on its current contents
+                    cprint(f"[INFO] {fname} changed since this patch was generated; regenerating...", "blue")
+                    current = (app_path / fname).read_text(encoding="utf-8", errors="replace")
+                    fname, new_code, explanation, summary = self.llm_apply_patch(app_path, upgrade, (fname, current))
+                if fname and new_code:
+                    target_path = app_path / fname
+                    # Dedicated backup in backup dir
+                    backup_path = backup_dir / f"{fname}_{_START}_{next(_seq):04d}.bak"
+                    if backup_path.parent not in ensured_dirs:
+                        backup_path.parent.mkdir(parents=True, exist_ok=True)
+                        ensured_dirs.add(backup_path.parent)
+                    # Keep the original bytes for backup/rollback; decode once for display only.
+                    old_bytes = target_path.read_bytes() if target_path.exists() else b""
+                    old_code = old_bytes.decode("utf-8", "replace")
+                    if target_path.exists():
+                        backup_path.write_bytes(old_bytes)
+                    cprint(f"\n--- AI Explanation of Upgrade ---\n{explanation}", "magenta")
+                    cprint(f"\n--- Plain Summary ---\n{summary}", "yellow")
+                    self.show_diff(old_code, new_code, fname)
+                    resp = self.ask_user(f"Apply this upgrade to {fname}?")
+                    if resp in ("y", "yes", "all"):
+                        target_path.write_bytes(new_code.encode("utf-8"))
+                        written.append(fname)
+                        cprint(f"[OK] Upgrade applied to {fname}!", "green")
+                        applied.append(fname)
+                        # Self-test
+                        try:
+                            mod = types.ModuleType(fname.replace(".py", ""))
+                            mod.__file__ = str(target_path)
+                            exec(_compile_source(new_code, str(target_path)), mod.__dict__)
+                            if hasattr(mod, "self_test"):
+                                cprint(f"[INFO] Running self_test for {fname}...", "blue")
+                                result = mod.self_test()
+                                if not result:
+                                    cprint(
+                                        f"[FAIL] Self-test failed. Rolling back {fname}.", "red"
+                                    )
+                                    target_path.write_bytes(old_bytes)
+                                    written.append(fname)
+                                    rollbacks.append(fname)
+                                else:
+                                    cprint(f"[PASS] Self-test passed for {fname}.", "green")
+                        except Exception as e:
+                            publish_event('error', {'agent': 'app_upgrade_executor', 'error': str(e), 'timestamp': datetime.datetime.now().isoformat()})  # [event_bus hook]
+                            cprint(f"[FAIL] Error during self-test: {e}", "red")
+                            target_path.write_bytes(old_bytes)
+                            written.append(fname)
+                            rollbacks.append(fname)
+                        # Update README.md doc with explanation
+                        readme = app_path / "README.md"
+                        if readme.exists():
+                            with readme.open("ab") as fp:
+                                fp.write(f"\n\n# Upgrade: {upgrade}\n{explanation}\n".encode("utf-8"))
+                        session_summaries.append({"file": fname, "summary": summary, "explanation": explanation})
+                    elif resp == "quit":
+                        break
+                    else:
+                        cprint(f"[SKIP] Upgrade skipped for {fname}.", "yellow")
+                        skipped.append(fname)
                 else:
-                    cprint(f"[SKIP] Upgrade skipped for {fname}.", "yellow")
-                    skipped.append(fname)
-            else:
-                cprint(f"[INFO] LLM could not generate patch for: {upgrade}", "yellow")
-                skipped.append(upgrade)
+                    cprint(f"[INFO] LLM could not generate patch for: {upgrade}", "yellow")
+                    skipped.append(upgrade)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
 
         if applied:
             resp = self.ask_user("Rollback all upgrades? (restore all backups)")
             if resp in ("y", "yes"):
+                # One directory walk, bucketed by original filename ("<fname>_<timestamp>[_<seq>].bak").
+                baks_by_fname = defaultdict(list)
+                for bak in sorted(backup_dir.rglob("*.bak")):
+                    baks_by_fname[_BACKUP_SUFFIX_RE.sub("", bak.relative_to(backup_dir).as_posix())].append(bak)
                 for fname in applied:
-                    backup_dir = BACKUP_ROOT / app_path.name
-                    backup_baks = sorted(backup_dir.glob(f"{fname}_*.bak"))
+                    backup_baks = baks_by_fname.get(Path(fname).as_posix())
                     if backup_baks:
                         last_backup = backup_baks[-1]
                         target_path = app_path / fname
-                        target_path.write_text(last_backup.read_text(encoding="utf-8"), encoding="utf-8")
+                        target_path.write_bytes(last_backup.read_bytes())
                 cprint("[OK] All upgrades rolled back.", "yellow")
 
         # Save session report
@@ -286,8 +337,8 @@ class Planner:
         )
         with open(report_path, "w", encoding="utf-8") as f:
             f.write(f"# Interactive App Upgrade Report ({app_path})\n")
-            f.write(f"\n## Applied Upgrades\n{json.dumps(applied, indent=2)}\n")
-            f.write(f"\n## Skipped Upgrades\n{json.dumps(skipped, indent=2)}\n")
-            f.write(f"\n## Rollbacks\n{json.dumps(rollbacks, indent=2)}\n")
-            f.write(f"\n## Summaries & Explanations\n{json.dumps(session_summaries, indent=2)}\n")
+            f.write(f"\n## Applied Upgrades\n{dumps_json(applied, indent=True)}\n")
+            f.write(f"\n## Skipped Upgrades\n{dumps_json(skipped, indent=True)}\n")
+            f.write(f"\n## Rollbacks\n{dumps_json(rollbacks, indent=True)}\n")
+            f.write(f"\n## Summaries & Explanations\n{dumps_json(session_summaries, indent=True)}\n")
         cprint(f"[INFO] Upgrade session complete. Report saved to {report_path}", "yellow")
@@ -1,11 +1,18 @@
 import datetime
 import difflib
-import json
+import itertools
+import multiprocessing
 import os
+import queue
+import random
 import shutil
 import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict, List, Tuple
 from agent.event_bus import publish_event
+from agent.utils import dumps_json, get_openai_client, llm_cached
 
 try:
     import openai
@@ -20,13 +27,29 @@ except ImportError:
 LOG_FILE = "logs/upgrade_history.json"
 BACKUP_ROOT = "logs/agent_backups"
 SUMMARY_FILE = "logs/upgrade_summaries.json"
+SUMMARY_LOG = "logs/upgrade_summaries.jsonl"
 RETRIES = 3
+UPGRADE_WORKERS = 8
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+TEST_TIMEOUT = 120
+
+_pytest_worker = None
+
+# Backup suffix: session start time plus a per-session sequence number (sortable, unique).
+_START = time.strftime("%Y%m%d_%H%M%S")
+_seq = itertools.count()
+_ensured_dirs = set()
+
+# Rate-limit/timeout errors worth backing off on.
+_TRANSIENT_ERRORS = (openai.RateLimitError, openai.APITimeoutError) if openai else ()
 
 def backup_agent(agent_name: str, code: str):
     backup_dir = os.path.join(BACKUP_ROOT, agent_name)
-    os.makedirs(backup_dir, exist_ok=True)
-    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_path = os.path.join(backup_dir, f"{agent_name}_{timestamp}.bak.py")
+    if backup_dir not in _ensured_dirs:
+        os.makedirs(backup_dir, exist_ok=True)
+        _ensured_dirs.add(backup_dir)
+    backup_path = os.path.join(backup_dir, f"{agent_name}_{_START}_{next(_seq):04d}.bak.py")
     with open(backup_path, "w", encoding="utf-8") as f:
         f.write(code)
     cprint(f"[INFO] Backup for {agent_name} saved to {backup_path}", "yellow")
@@ -34,7 +57,8 @@ def backup_agent(agent_name: str, code: str):
 
 def explain_upgrade(agent_name: str, changes: str, summary: str = None) -> str:
     # Short, simple summary for the agent upgrade. Uses LLM if available.
-    if not openai or not os.environ.get("OPENAI_API_KEY"):
+    client = get_openai_client()
+    if not client:
         return f"Upgraded {agent_name}: {changes[:200]}..."
     prompt = (
         f"Here are the code changes for an AI agent '{agent_name}':\n"
@@ -43,57 +67,156 @@ def explain_upgrade(agent_name: str, changes: str, summary: str = None) -> str:
         f"If more details wanted, say 'Ask for more details.'"
     )
     try:
-        resp = openai.ChatCompletion.create(
-            model="gpt-4o",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=350,
-            temperature=0.1,
-        )
-        return resp.choices[0].message.content.strip()
+        text = llm_cached(client.chat.completions.create, prompt, model="gpt-4o", max_tokens=350, temperature=0.1)
+        return text.strip()
     except Exception as e:
         publish_event('error', {'agent': 'auto_upgrade_agent', 'error': str(e), 'timestamp': datetime.datetime.now().isoformat()})
         return f"Upgraded {agent_name}: {changes[:200]}... (LLM summary failed)"
 
+def append_summary(entry: Dict[str, Any]):
+    # One JSON line per agent, written as soon as it finishes so a crash keeps earlier results.
+    with open(SUMMARY_LOG, "a", encoding="utf-8") as f:
+        f.write(dumps_json(entry) + "\n")
+
 def show_diff(old: str, new: str, name: str):
-    diff = difflib.unified_diff(
+    for line in difflib.unified_diff(
         old.splitlines(),
         new.splitlines(),
         fromfile=f"{name}.py (old)",
         tofile=f"{name}.py (new)",
         lineterm="",
-    )
-    cprint("\n".join(diff), "blue")
+    ):
+        cprint(line, "blue")
+
+def _pytest_server(requests, results):
+    # Imports pytest once, then forks per request; each child drops the agent package
+    # from sys.modules so pytest imports the freshly written code, not this process's copy.
+    import importlib
+    import pytest
+    for path in iter(requests.get, None):
+        with tempfile.TemporaryFile() as out:
+            pid = os.fork()
+            if pid == 0:
+                os.dup2(out.fileno(), 1)
+                os.dup2(out.fileno(), 2)
+                rc = 1
+                try:
+                    for mod in [m for m in sys.modules if m == "agent" or m.startswith("agent.")]:
+                        del sys.modules[mod]
+                    importlib.invalidate_caches()
+                    rc = int(pytest.main([path]))
+                finally:
+                    sys.stdout.flush()
+                    sys.stderr.flush()
+                    os._exit(rc)
+            _, status = os.waitpid(pid, 0)
+            out.seek(0)
+            results.put((os.waitstatus_to_exitcode(status), out.read().decode("utf-8", "replace")))
+
+def start_pytest_worker():
+    global _pytest_worker
+    if _pytest_worker is not None or not hasattr(os, "fork"):
+        return
+    ctx = multiprocessing.get_context("spawn")  # a forked worker would inherit the pre-upgrade agents
+    requests, results = ctx.Queue(), ctx.Queue()
+    proc = ctx.Process(target=_pytest_server, args=(requests, results), daemon=True)
+    proc.start()
+    _pytest_worker = (proc, requests, results)
+
+def stop_pytest_worker():
+    global _pytest_worker
+    if _pytest_worker is None:
+        return
+    proc, requests, _ = _pytest_worker
+    _pytest_worker = None
+    requests.put(None)
+    proc.join(timeout=5)
+    if proc.is_alive():
+        proc.terminate()
 
 def run_agent_tests(agent_path: str) -> Tuple[bool, str]:
+    if _pytest_worker is not None and _pytest_worker[0].is_alive():
+        _, requests, results = _pytest_worker
+        requests.put(agent_path)
+        try:
+            rc, output = results.get(timeout=TEST_TIMEOUT)
+            return rc == 0, output
+        except queue.Empty:
+            stop_pytest_worker()
+            return False, f"[Test runner error] pytest timed out after {TEST_TIMEOUT}s"
+
     import subprocess
     try:
         proc = subprocess.run(
             [sys.executable, "-m", "pytest", agent_path],
             capture_output=True,
             text=True,
-            timeout=120,
+            timeout=TEST_TIMEOUT,
         )
         return proc.returncode == 0, proc.stdout + proc.stderr
     except Exception as e:
         publish_event('error', {'agent': 'auto_upgrade_agent', 'error': str(e), 'timestamp': datetime.datetime.now().isoformat()})
         return False, f"[Test runner error] {e}"
 
+def with_backoff(fn, *args, **kwargs):
+    # Exponential backoff with full jitter, only for transient API errors.
+    for attempt in range(RETRIES):
+        try:
+            return fn(*args, **kwargs)
+        except _TRANSIENT_ERRORS:
+            if attempt == RETRIES - 1:
+                raise
+            time.sleep(random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)))
+
+def request_upgrade(orig_code: str, force: bool = False) -> str:
+    prompt = (
+        f"Upgrade/refactor this AI agent for superhuman reliability, "
+        f"explainability, speed, and safety. Make all improvements possible for a god-tier AI agent.\n"
+        f"Code:\n{orig_code[:8000]}\n"
+        f"Output only improved code in a python code block. "
+        f"After code, write a brief (2-3 sentences) summary of what was improved and why."
+    )
+    return with_backoff(
+        llm_cached, get_openai_client().chat.completions.create, prompt,
+        model="gpt-4o", max_tokens=3500, temperature=0.1, force=force,
+    )
+
 def ask(prompt: str) -> str:
     cprint(f"{prompt} (Press Enter to continue or type 'more' for details): ", "yellow", end="")
     return input().strip().lower()
 
 def auto_upgrade_all_agents_superpowered():
     agent_dir = os.path.abspath(os.path.dirname(__file__))
-    agent_files = [
-        f for f in os.listdir(agent_dir)
-        if f.endswith(".py") and f not in ("__init__.py", os.path.basename(__file__))
-    ]
+    start_pytest_worker()
+    skip = ("__init__.py", os.path.basename(__file__))
+    with os.scandir(agent_dir) as entries:
+        agent_files = [
+            e.name for e in entries
+            if e.is_file() and e.name.endswith(".py") and e.name not in skip
+        ]
+
+    def read_source(name: str) -> str:
+        with open(os.path.join(agent_dir, name), encoding="utf-8") as f:
+            return f.read()
+
+    with ThreadPoolExecutor(max_workers=UPGRADE_WORKERS) as pool:
+        sources = dict(zip(agent_files, pool.map(read_source, agent_files)))
+
+    # Fire off the first-attempt proposals for every agent concurrently so the
+    # LLM round-trips overlap; retries after a failed test are issued serially.
+    client = get_openai_client()  # resolved now, so a key loaded after import is picked up
+    executor = None
+    proposals = {}
+    if client:
+        executor = ThreadPoolExecutor(max_workers=UPGRADE_WORKERS)
+        proposals = {file: executor.submit(request_upgrade, code) for file, code in sources.items()}
+
+    os.makedirs(os.path.dirname(SUMMARY_LOG), exist_ok=True)
     summaries = []
     for file in agent_files:
         agent_name = file[:-3]
         code_path = os.path.join(agent_dir, file)
-        with open(code_path, encoding="utf-8") as f:
-            orig_code = f.read()
+        orig_code = sources[file]
 
         cprint(f"\n=== Upgrading agent: {agent_name} ===", "cyan", attrs=["bold"])
         backup_path = backup_agent(agent_name, orig_code)
@@ -102,25 +225,16 @@ def auto_upgrade_all_agents_superpowered():
         last_error = ""
         for attempt in range(1, RETRIES+1):
             # Step 1: Request LLM to propose upgrade/refactor
-            if not openai:
-                cprint("[ERROR] OpenAI SDK not available. Skipping upgrade.", "red")
+            if not client:
+                cprint("[ERROR] OpenAI client not available. Skipping upgrade.", "red")
                 break
 
-            prompt = (
-                f"Upgrade/refactor this AI agent for superhuman reliability, "
-                f"explainability, speed, and safety. Make all improvements possible for a god-tier AI agent.\n"
-                f"Code:\n{orig_code[:8000]}\n"
-                f"Output only improved code in a python code block. "
-                f"After code, write a brief (2-3 sentences) summary of what was improved and why."
-            )
             try:
-                resp = openai.ChatCompletion.create(
-                    model="gpt-4o",
-                    messages=[{"role": "user", "content": prompt}],
-                    max_tokens=3500,
-                    temperature=0.1,
-                )
-                full_response = resp.choices[0].message.content
+                if attempt == 1:
+                    full_response = proposals[file].result()
+                else:
+                    # Same prompt as the failed attempt: bypass the cache to get a fresh sample.
+                    full_response = request_upgrade(orig_code, force=True)
                 # Extract improved code and summary
                 improved_code = ""
                 summary = ""
@@ -172,21 +286,26 @@ def auto_upgrade_all_agents_superpowered():
         # Explanation step
         summary_text = explain_upgrade(agent_name, upgrade_summary)
         cprint(f"\n[SUMMARY] {agent_name}: {summary_text}", "magenta")
-        summaries.append({
+        entry = {
             "agent": agent_name,
             "summary": summary_text,
             "success": upgrade_success
-        })
+        }
+        summaries.append(entry)
+        append_summary(entry)
 
         # Offer deeper explanation
         if ask("Next agent, or type 'more' for details?") == "more":
             cprint(f"\n--- FULL UPGRADE LOG FOR {agent_name} ---\n{upgrade_summary}\n", "blue")
             input("Press Enter to continue...")
 
-    # Save all summaries
-    os.makedirs(os.path.dirname(SUMMARY_FILE), exist_ok=True)
+    if executor:
+        executor.shutdown(wait=False)
+    stop_pytest_worker()
+
+    # Save all summaries (JSON array kept for the auditor/devops readers)
     with open(SUMMARY_FILE, "w", encoding="utf-8") as f:
-        json.dump(summaries, f, indent=2)
+        f.write(dumps_json(summaries, indent=True))
 
     cprint("\nAll agent upgrades complete!", "green", attrs=["bold"])
 
@@ -0,0 +1,59 @@
+# agent/cas_backup.py
+
+import datetime
+import hashlib
+import os
+import threading
+from pathlib import Path
+
+from agent.utils import append_jsonl, fast_copy
+
+CAS_ROOT = Path("logs/agent_backups/_cas")
+CAS_INDEX = Path("logs/agent_backups/_index.jsonl")
+HASH_BUFFER_SIZE = 1 << 20
+
+def file_sha256(path) -> str:
+    """SHA-256 of a file's contents (OpenSSL-backed, SHA-NI where the CPU has it)."""
+    with open(path, "rb") as f:
+        if hasattr(hashlib, "file_digest"):
+            return hashlib.file_digest(f, "sha256").hexdigest()
+        digest = hashlib.sha256()
+        for chunk in iter(lambda: f.read(HASH_BUFFER_SIZE), b""):
+            digest.update(chunk)
+        return digest.hexdigest()
+
+def _store_blob(src: Path, sha: str) -> Path:
+    """Copy src into the store under its hash unless an identical blob is already there."""
+    blob = CAS_ROOT / sha[:2] / sha[2:]
+    if not blob.exists():
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        tmp = blob.with_name(f"{blob.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        fast_copy(src, tmp)
+        os.chmod(tmp, 0o444)  # blobs are shared by every link to them; never edit in place
+        os.replace(tmp, blob)
+    return blob
+
+def backup(src, dest) -> str:
+    """
+    Back up src to dest, storing its bytes once per distinct content.
+    dest becomes a hard link to the shared blob (a copy if the filesystem cannot link),
+    so existing *.bak_* layouts used by rollback keep working. Returns the SHA-256.
+    """
+    src, dest = Path(src), Path(dest)
+    sha = file_sha256(src)
+    blob = _store_blob(src, sha)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    if dest.exists():
+        dest.unlink()
+    try:
+        os.link(blob, dest)
+    except OSError:
+        fast_copy(blob, dest)
+    CAS_INDEX.parent.mkdir(parents=True, exist_ok=True)
+    append_jsonl(str(CAS_INDEX), {
+        "ts": datetime.datetime.now().isoformat(),
+        "src": str(src),
+        "dest": str(dest),
+        "sha": sha,
+    })
+    return sha
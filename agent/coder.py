@@ -1,14 +1,23 @@
+import collections
 import datetime
 import difflib
-import json
+import hashlib
+import itertools
 import logging
+import math
 import os
-import shutil
+import re
 import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import List, Optional, Tuple, Dict, Any
 from pathlib import Path
 
 from agent.context_loader import load_app_context
+from agent.utils import (
+    append_jsonl, atomic_write_bytes, dumps_json_bytes, fast_copy, get_openai_client, iter_jsonl, load_json_file,
+    loads_json,
+)
 from agent.event_bus import (
     publish_event, publish_request, publish_response, start_listener_in_thread
 )
@@ -18,9 +27,29 @@ try:
 except ImportError:
     def cprint(msg, color=None, **kwargs): print(msg)
 
-CODER_LOG = "logs/coder_activity.json"
+CODER_LOG = "logs/coder_activity.jsonl"
 BACKUP_ROOT = "logs/agent_backups/coder"
 RETRIES = 3
+_HEADER_RE = re.compile(r"[\w./]+\.py:$")  # filename header line, e.g. "bot.py:"
+MAX_PARALLEL_MODELS = 8
+MAX_DIFF_LINES = 2000
+COMMAND_OUTPUT_LINES = 10_000
+CONSENSUS_SIMILARITY = 0.95
+MEMORY_LOG = "memory_log.jsonl"  # per-app append-only tail of memory.json["code_changes"]
+MEMORY_COMPACT_BYTES = 256 * 1024
+
+# Invariant instructions sent as the system message so providers can cache the prefix.
+_SYSTEM_PROMPT = (
+    "You are a world-class Python architect and code agent.\n"
+    "Instructions:\n"
+    "- Generate improved/new code ONLY for the required files (show filename as header e.g. `bot.py:`).\n"
+    "- For every file, include full new code block. If unchanged, do NOT include it.\n"
+    "- Generate or upgrade matching test_*.py for any new logic.\n"
+    "- Write a numbered changelog explaining all changes.\n"
+    "- Ensure all code is PEP8, tested, with docstrings and type hints.\n"
+    "- For each code file, include a pydoc docstring block at the top.\n"
+    "- Do NOT output API keys or secrets.\n"
+)
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -28,19 +57,87 @@ logging.basicConfig(
 
 def _log_action(action: str, details: Dict[str, Any] = None):
     os.makedirs(os.path.dirname(CODER_LOG), exist_ok=True)
-    if os.path.exists(CODER_LOG):
-        with open(CODER_LOG, encoding="utf-8") as f:
-            all_logs = json.load(f)
-    else:
-        all_logs = []
     entry = {
         "timestamp": datetime.datetime.now().isoformat(),
         "action": action,
         "details": details or {}
     }
-    all_logs.append(entry)
-    with open(CODER_LOG, "w", encoding="utf-8") as f:
-        json.dump(all_logs, f, indent=2)
+    append_jsonl(CODER_LOG, entry)
+
+def _compact_memory(app_dir: str, threshold: int = MEMORY_COMPACT_BYTES) -> None:
+    """
+    Fold pending memory_log.jsonl entries into memory.json["code_changes"] once the log
+    exceeds `threshold` bytes, then truncate the log (snapshot + append-only tail).
+    The snapshot is replaced atomically before the log is touched, and only the compacted
+    bytes are dropped from the log, so lines appended meanwhile are kept.
+    """
+    log_path = os.path.join(app_dir, MEMORY_LOG)
+    if not os.path.exists(log_path) or os.path.getsize(log_path) < threshold:
+        return
+    with open(log_path, "rb") as f:
+        data = f.read()
+    compacted = data.rfind(b"\n") + 1  # whole lines only; a partial last line stays in the log
+    records = []
+    for line in data[:compacted].splitlines():
+        if line.strip():
+            try:
+                records.append(loads_json(line))
+            except ValueError:
+                continue
+    mem_path = os.path.join(app_dir, "memory.json")
+    mem = load_json_file(mem_path, default={})
+    mem.setdefault("code_changes", []).extend(records)
+    atomic_write_bytes(mem_path, dumps_json_bytes(mem))
+    with open(log_path, "rb") as f:
+        f.seek(compacted)
+        tail = f.read()
+    atomic_write_bytes(log_path, tail)
+
+def _read_log():
+    """Yield logged coder actions, oldest first."""
+    return iter_jsonl(CODER_LOG)
+
+def _iter_code_blocks(reply: str):
+    """
+    Single pass over an LLM reply, yielding (filename, code) for every `name.py:` header line.
+    Text before the first header (preamble/changelog) is ignored.
+    """
+    fname = None
+    body: List[str] = []
+    for line in reply.splitlines():
+        if line.endswith(".py:") and _HEADER_RE.match(line):
+            if fname:
+                yield fname, "\n".join(body).strip()
+            fname, body = line[:-1], []
+        elif fname:
+            body.append(line)
+    if fname:
+        yield fname, "\n".join(body).strip()
+
+def _consensus_reply(responses: List[str], embed=None, threshold: float = CONSENSUS_SIMILARITY) -> Optional[str]:
+    """
+    Return a reply every model agrees on, or None if the user should choose.
+    Exact agreement is checked by hashing whitespace-normalized text; near-duplicates
+    (min pairwise cosine similarity of `embed` vectors above threshold) pick the shortest.
+    """
+    if any(r.startswith("[ERROR:") for r in responses):
+        return None
+    digests = {hashlib.blake2b(" ".join(r.split()).encode("utf-8")).hexdigest() for r in responses}
+    if len(digests) == 1:
+        return responses[0]
+    if embed is None:
+        return None
+    try:
+        vectors = embed(responses)
+    except Exception as e:
+        logging.warning(f"Consensus embedding failed, falling back to manual selection: {e}")
+        return None
+    norms = [math.sqrt(sum(x * x for x in v)) or 1.0 for v in vectors]
+    for i, j in itertools.combinations(range(len(vectors)), 2):
+        cosine = sum(a * b for a, b in zip(vectors[i], vectors[j])) / (norms[i] * norms[j])
+        if cosine <= threshold:
+            return None
+    return min(responses, key=len)
 
 class Coder:
     """
@@ -48,26 +145,58 @@ class Coder:
     """
 
     @staticmethod
-    def backup_file(file_path: str) -> None:
+    def backup_file(file_path: str) -> Optional[Path]:
+        """Back up file_path into BACKUP_ROOT; returns the backup path, or None if there was no file."""
         file_path = Path(file_path)
-        if file_path.exists():
-            backup_dir = Path(BACKUP_ROOT)
-            backup_dir.mkdir(parents=True, exist_ok=True)
-            bak = backup_dir / f"{file_path.stem}.bak_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}{file_path.suffix}"
-            shutil.copyfile(file_path, bak)
-            logging.info(f"Backup created: {bak}")
+        if not file_path.exists():
+            return None
+        backup_dir = Path(BACKUP_ROOT)
+        backup_dir.mkdir(parents=True, exist_ok=True)
+        bak = backup_dir / f"{file_path.stem}.bak_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}{file_path.suffix}"
+        fast_copy(file_path, bak)
+        logging.info(f"Backup created: {bak}")
+        return bak
 
     @staticmethod
     def run_command(cmd: str) -> Tuple[str, bool]:
-        """Run a shell command and return (stdout, success)."""
-        try:
-            result = subprocess.run(
-                cmd, shell=True, text=True, capture_output=True, check=True
-            )
-            return result.stdout, True
-        except subprocess.CalledProcessError as e:
-            logging.error(f"Command failed: {e}")
-            return (e.stdout or "") + (e.stderr or ""), False
+        """
+        Run a shell command and return (output, success).
+        stdout/stderr are merged and streamed to the log as they arrive; only the last
+        COMMAND_OUTPUT_LINES lines are kept in memory for the returned output.
+        """
+        lines = collections.deque(maxlen=COMMAND_OUTPUT_LINES)
+        with subprocess.Popen(
+            cmd, shell=True, text=True, bufsize=1, errors="replace",
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        ) as proc:
+            for line in proc.stdout:
+                logging.info(line.rstrip())
+                lines.append(line)
+            returncode = proc.wait()
+        if returncode != 0:
+            logging.error(f"Command failed: {cmd!r} returned non-zero exit status {returncode}.")
+        return "".join(lines), returncode == 0
+
+    @classmethod
+    def run_quality_tools(cls, app_dir: str) -> Dict[str, Tuple[str, bool]]:
+        """
+        Format with black, then run the read-only checkers (flake8, mypy, bandit) concurrently.
+        Returns {tool: (output, success)}.
+        """
+        logging.info("Running black...")
+        results = {"black": cls.run_command(f"black {app_dir}")}
+        checks = {
+            "flake8": f"flake8 {app_dir}",
+            "mypy": f"mypy {app_dir}",
+            "bandit": f"bandit -r {app_dir}",
+        }
+        with ThreadPoolExecutor(max_workers=len(checks)) as executor:
+            futures = {executor.submit(cls.run_command, cmd): tool for tool, cmd in checks.items()}
+            logging.info(f"Running {', '.join(checks)}...")
+            for fut in as_completed(futures):
+                results[futures[fut]] = fut.result()
+                logging.info(f"{futures[fut]} finished.")
+        return results
 
     @staticmethod
     def run_tests(app_dir: str) -> Tuple[str, bool]:
@@ -104,53 +233,52 @@ class Coder:
             # Pre-upgrade test run for baseline
             logging.info("Running pre-upgrade tests (pytest)...")
             pre_test_out, pre_ok = cls.run_tests(app_dir)
-            logging.info(pre_test_out)
             if not pre_ok:
                 logging.warning("Tests are failing before upgrade. Please fix before refactor!")
                 return
 
-            # Compose AI prompt
+            # Compose AI prompt: only the per-call part; the static prefix is _SYSTEM_PROMPT
             prompt = (
-                f"You are a world-class Python architect and code agent.\n"
                 f"Task: {user_goal}\n"
                 f"Project configs: {context['configs']}\n"
                 f"Goals: {context['goals']}\n"
                 f"Current code files (partial):\n"
-            )
-            for fname, code in context["code_files"].items():
-                prompt += f"\n# {fname}\n{code}\n"
-
-            prompt += (
-                "\n\nInstructions:\n"
-                "- Generate improved/new code ONLY for the required files (show filename as header e.g. `bot.py:`).\n"
-                "- For every file, include full new code block. If unchanged, do NOT include it.\n"
-                "- Generate or upgrade matching test_*.py for any new logic.\n"
-                "- Write a numbered changelog explaining all changes.\n"
-                "- Ensure all code is PEP8, tested, with docstrings and type hints.\n"
-                "- For each code file, include a pydoc docstring block at the top.\n"
-                "- Do NOT output API keys or secrets.\n"
-            )
+            ) + "".join(f"\n# {fname}\n{code}\n" for fname, code in context["code_files"].items())
 
             # Multi-model consensus support (optional)
-            responses = []
             model_list = consensus_models or ["gpt-4o"]
-            for m in model_list:
+
+            def request_model(m: str) -> str:
                 logging.info(f"Requesting LLM response from {m}...")
                 try:
                     res = openai.ChatCompletion.create(
                         model=m,
-                        messages=[{"role": "system", "content": prompt}],
+                        messages=[
+                            {"role": "system", "content": _SYSTEM_PROMPT},
+                            {"role": "user", "content": prompt},
+                        ],
                         max_tokens=2000,
                     )
-                    text = res.choices[0].message.content
-                    responses.append(text)
+                    return res.choices[0].message.content
                 except Exception as e:
                     publish_event('error', {'agent': 'coder', 'error': str(e), 'timestamp': datetime.datetime.now().isoformat()})
-                    responses.append(f"[ERROR: {e}]")
                     logging.error(f"Error requesting LLM response: {e}")
+                    return f"[ERROR: {e}]"
+
+            # Query all models concurrently; wall time is the slowest model, not the sum.
+            with ThreadPoolExecutor(max_workers=min(len(model_list), MAX_PARALLEL_MODELS)) as executor:
+                responses = list(executor.map(request_model, model_list))
+
+            def embed(texts: List[str]) -> List[List[float]]:
+                res = get_openai_client(api_key).embeddings.create(model="text-embedding-3-small", input=texts)
+                return [d.embedding for d in res.data]
 
             # Show user all responses if consensus mode, else just the one
-            if len(responses) > 1:
+            agreed = _consensus_reply(responses, embed) if len(responses) > 1 else None
+            if agreed is not None:
+                logging.info("All models agree on the upgrade; skipping manual selection.")
+                reply = agreed
+            elif len(responses) > 1:
                 logging.info("Multiple model outputs for review. Pick your favorite:")
                 for idx, out in enumerate(responses):
                     preview = out[:1000] + ("..." if len(out) > 1000 else "")
@@ -168,15 +296,8 @@ class Coder:
             logging.info(reply)
 
             # Extract filename/code blocks and proposed tests from LLM output
-            import re
-            code_blocks = re.split(r"\n(?=[\w\.]+\.py:)", reply)
             changes = []
-            for block in code_blocks:
-                lines = block.strip().split("\n")
-                if not lines or ":" not in lines[0]:
-                    continue
-                fname = lines[0].rstrip(":")
-                code = "\n".join(lines[1:]).strip()
+            for fname, code in _iter_code_blocks(reply):
                 file_path = os.path.abspath(os.path.join(app_dir, fname))
                 prev_code = ""
                 if os.path.exists(file_path):
@@ -189,10 +310,12 @@ class Coder:
                     tofile=f"{fname} (new)",
                     lineterm="",
                 )
-                # ========== FIXED SECTION ==========
-                diff_text = '\n'.join(list(diff)) or '[file created]'
+                # Bounded: very large rewrites are truncated instead of fully materialized.
+                diff_lines = list(itertools.islice(diff, MAX_DIFF_LINES + 1))
+                if len(diff_lines) > MAX_DIFF_LINES:
+                    diff_lines[MAX_DIFF_LINES:] = ["...[truncated]"]
+                diff_text = '\n'.join(diff_lines) or '[file created]'
                 logging.info(f"--- DIFF for {fname} ---\n{diff_text}")
-                # ========== END FIX ==========
                 changes.append({
                     "fname": fname,
                     "code": code,
@@ -205,24 +328,16 @@ class Coder:
                 summary = f"\n=== PLAN: {ch['fname']} ===\n\n{ch['code'][:800]}\n---"
                 cprint(summary, "cyan")
                 if input(f"Apply changes to {ch['fname']}? (y/n): ").lower().startswith("y"):
-                    cls.backup_file(ch["file_path"])
+                    bak_path = cls.backup_file(ch["file_path"])
                     post_ok = False
                     for attempt in range(1, RETRIES + 1):
                         try:
                             with open(ch["file_path"], "w", encoding="utf-8") as f:
                                 f.write(ch["code"])
                             # Run hygiene tools
-                            logging.info("Running black...")
-                            cls.run_command(f"black {app_dir}")
-                            logging.info("Running flake8...")
-                            cls.run_command(f"flake8 {app_dir}")
-                            logging.info("Running mypy...")
-                            cls.run_command(f"mypy {app_dir}")
-                            logging.info("Running bandit...")
-                            cls.run_command(f"bandit -r {app_dir}")
+                            cls.run_quality_tools(app_dir)
                             # Test after each attempt
                             post_test_out, post_ok = cls.run_tests(app_dir)
-                            logging.info(post_test_out)
                             if post_ok:
                                 cprint(f"✅ Upgrade succeeded for {ch['fname']}.", "green")
                                 break
@@ -234,14 +349,11 @@ class Coder:
                         # Rollback after last failed attempt
                         if attempt == RETRIES:
                             cprint(f"[FAIL] All attempts failed. Rolling back {ch['fname']}.", "red")
-                            backups = [
-                                f for f in os.listdir(os.path.dirname(ch["file_path"]))
-                                if f.startswith(os.path.basename(ch["file_path"]) + ".bak_")
-                            ]
-                            if backups:
-                                latest_bak = sorted(backups)[-1]
-                                bak_path = os.path.join(os.path.dirname(ch["file_path"]), latest_bak)
-                                shutil.copyfile(bak_path, ch["file_path"])
+                            if bak_path:
+                                fast_copy(bak_path, ch["file_path"])
+                            elif os.path.exists(ch["file_path"]):
+                                # File did not exist before the upgrade: remove the new one.
+                                os.remove(ch["file_path"])
                             cprint(f"Rolled back {ch['fname']}.", "red")
                     # Log action for dashboard
                     _log_action("upgrade_file", {
@@ -258,21 +370,13 @@ class Coder:
             )
             with open(log_path, "w", encoding="utf-8") as logf:
                 logf.write(f"User goal: {user_goal}\n\nLLM output:\n{reply}\n")
-            mem_path = os.path.join(app_dir, "memory.json")
-            mem = {}
             try:
-                if os.path.exists(mem_path):
-                    with open(mem_path, encoding="utf-8") as mf:
-                        mem = json.load(mf)
-                if "code_changes" not in mem:
-                    mem["code_changes"] = []
-                mem["code_changes"].append({
+                append_jsonl(os.path.join(app_dir, MEMORY_LOG), {
                     "timestamp": datetime.datetime.now().isoformat(),
                     "goal": user_goal,
                     "summary": reply[:2000],
                 })
-                with open(mem_path, "w", encoding="utf-8") as mf:
-                    json.dump(mem, mf, indent=2)
+                _compact_memory(app_dir)
             except Exception as e:
                 publish_event('error', {'agent': 'coder', 'error': str(e), 'timestamp': datetime.datetime.now().isoformat()})
                 logging.error(f"Error updating memory: {e}")
@@ -300,5 +404,14 @@ def handle_review_request(event):
     result = {"status": "handled", "details": "review_request handled by agent."}
     publish_response("review_result", result, correlation_id=event.get("correlation_id"))
 
-start_listener_in_thread(handle_upgrade_request, event_types=["upgrade_request"])
-start_listener_in_thread(handle_review_request, event_types=["review_request"])
+def register_event_handlers():
+    """Start the Coder's event-bus listeners (a no-op if already running)."""
+    start_listener_in_thread(handle_upgrade_request, event_types=["upgrade_request"])
+    start_listener_in_thread(handle_review_request, event_types=["review_request"])
+
+if os.environ.get("AGENT_LISTEN") == "1":
+    register_event_handlers()
+
+if __name__ == "__main__":
+    register_event_handlers()
+    threading.Event().wait()
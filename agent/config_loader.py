@@ -3,8 +3,14 @@
 import os
 import yaml
 import logging
+from functools import lru_cache
 from pathlib import Path
 
+try:
+    from yaml import CSafeLoader as SafeLoader  # libyaml C binding
+except ImportError:
+    from yaml import SafeLoader
+
 class ConfigLoader:
     _config = None
 
@@ -20,8 +26,7 @@ class ConfigLoader:
             logging.error(f"Config file not found: {config_path}")
             raise FileNotFoundError(f"Config file not found: {config_path}")
 
-        with open(config_path, "r", encoding="utf-8") as f:
-            config = yaml.safe_load(f)
+        config = cls._parse_yaml(Path(config_path))
 
         # Override with environment variables if present (env vars take priority)
         env_overrides = {
@@ -48,6 +53,12 @@ class ConfigLoader:
         logging.info("Configuration loaded successfully.")
         return cls._config
 
+    @staticmethod
+    def _parse_yaml(config_path: Path):
+        """Parse the YAML file with the C-accelerated safe loader when libyaml is available."""
+        with open(config_path, "r", encoding="utf-8") as f:
+            return yaml.load(f, Loader=SafeLoader)
+
     @classmethod
     def get(cls, key: str, default=None):
         if cls._config is None:
@@ -55,10 +66,12 @@ class ConfigLoader:
         return cls._config.get(key, default)
 
     @classmethod
+    @lru_cache(maxsize=256)
     def get_path(cls, *path_parts, default=None):
         """
         Returns a resolved absolute Path from config base_dir plus path_parts.
         Example: get_path('logs_dir', 'agent_backups')
+        Results are memoized per path_parts (config is loaded once per process).
         """
         config = cls.load_config()
         base_dir = Path(config.get("paths", {}).get("base_dir", ".")).resolve()
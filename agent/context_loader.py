@@ -1,18 +1,29 @@
+import collections
+import heapq
 import os
-import json
 from pathlib import Path
 from dotenv import dotenv_values
 from typing import Dict, Any, List, Optional
 import logging
 import datetime
 from agent.event_bus import publish_event
+from agent.utils import append_jsonl, iter_jsonl, loads_json
+
+try:
+    import ijson  # streaming parser for large memory.json files
+except ImportError:
+    ijson = None
 
 # Config
-CONTEXT_LOG = "logs/context_loader_activity.json"
+CONTEXT_LOG = "logs/context_loader_activity.jsonl"
 MAX_LENGTH = 100_000
 LOG_COUNT = 5
 DATA_SAMPLE_MAX_LENGTH = 5000
-SENSITIVE_KEYS = {"api_key", "token", "password", "secret", "key"}
+SNIFF_BYTES = 8192
+MEMORY_CHANGES_LIMIT = 50  # most recent memory code_changes / deployments kept in context
+# Data samples are arbitrary user files; only open formats that are plausibly text.
+DATA_SAMPLE_EXTS = frozenset({".txt", ".log", ".csv", ".tsv", ".json", ".jsonl", ".yaml", ".yml", ".md", ".py", ".xml", ".ini"})
+SENSITIVE_KEYS = frozenset({"api_key", "token", "password", "secret", "key"})
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -20,50 +31,57 @@ logging.basicConfig(
 
 def _log_action(action: str, details: Optional[dict] = None):
     os.makedirs("logs", exist_ok=True)
-    if Path(CONTEXT_LOG).exists():
-        with open(CONTEXT_LOG, encoding="utf-8") as f:
-            all_logs = json.load(f)
-    else:
-        all_logs = []
     entry = {
         "timestamp": datetime.datetime.now().isoformat(),
         "action": action,
         "details": details or {}
     }
-    all_logs.append(entry)
-    with open(CONTEXT_LOG, "w", encoding="utf-8") as f:
-        json.dump(all_logs, f, indent=2)
+    append_jsonl(CONTEXT_LOG, entry)
+
+def _read_log():
+    """Yield logged context-loader actions, oldest first."""
+    return iter_jsonl(CONTEXT_LOG)
 
 def safe_read(path: Path, mode: str = "r", max_length: int = MAX_LENGTH) -> str:
     """
     Read file contents safely, handling encoding errors and large files.
-    Tries multiple encodings and replaces invalid bytes.
+    Opens the file once in binary mode, reads at most max_length+1 bytes into a
+    preallocated buffer and decodes as UTF-8, replacing invalid bytes.
+    Files whose first bytes contain NUL are treated as binary and skipped.
     Truncates content with '[TRUNCATED]' if exceeding max_length.
     """
-    encodings_to_try = ["utf-8", "latin-1", "cp1252"]
-    for enc in encodings_to_try:
-        try:
-            with path.open(mode, encoding=enc, errors="replace") as f:
-                data = f.read(max_length + 1)
-                if len(data) > max_length:
-                    return data[:max_length] + "\n...[TRUNCATED]"
-                return data
-        except (UnicodeDecodeError, FileNotFoundError, IOError):
-            continue
-    return f"[ERROR reading {path}: unable to decode with tried encodings]"
+    cap = max_length + 1
+    try:
+        size = path.stat().st_size
+        with path.open("rb") as f:
+            head = f.read(min(SNIFF_BYTES, cap))
+            if b"\x00" in head:
+                return "[binary file, skipped]"
+            # Size 0 means unknown (e.g. pseudo-files): allow up to the cap.
+            buf = bytearray(max(min(size, cap) if size else cap, len(head)))
+            n = len(head)
+            buf[:n] = head
+            while n < len(buf):
+                got = f.readinto(memoryview(buf)[n:])
+                if not got:
+                    break
+                n += got
+            data = str(memoryview(buf)[:n], "utf-8", "replace")
+            truncated = size > n if size else n >= cap
+    except (FileNotFoundError, IOError) as e:
+        return f"[ERROR reading {path}: {e}]"
+    if truncated or len(data) > max_length:
+        return data[:max_length] + "\n...[TRUNCATED]"
+    return data
 
 def load_env(env_path: Path) -> Dict[str, str]:
     """
     Parse .env file as a dict, masking sensitive keys like API keys, tokens, secrets.
     """
-    env_data = dotenv_values(env_path)
-    masked = {}
-    for k, v in env_data.items():
-        if k.lower() in SENSITIVE_KEYS:
-            masked[k] = (v[:5] + "...") if v and len(v) > 5 else v
-        else:
-            masked[k] = v
-    return masked
+    return {
+        k: (v[:5] + "...") if v and len(v) > 5 and k.casefold() in SENSITIVE_KEYS else v
+        for k, v in dotenv_values(env_path).items()
+    }
 
 def load_files(
     base_dir: Path, patterns: List[str], context_key: str, context: Dict[str, Any], preview: bool = False, max_length: int = DATA_SAMPLE_MAX_LENGTH
@@ -82,15 +100,112 @@ def load_files(
                 publish_event('error', {'agent': 'context_loader', 'error': str(e), 'timestamp': datetime.datetime.now().isoformat()})  # [event_bus hook]
                 logging.error(f"Error loading file {path}: {e}")
 
+_CONFIG_EXTS = frozenset({".json", ".yaml", ".yml", ".ini"})
+_DOC_EXTS = frozenset({".md", ".txt"})
+
+def _scan_app_files(base_dir: Path) -> Dict[str, List[os.DirEntry]]:
+    """
+    Walk base_dir once with os.scandir and bucket files by the context section they feed
+    (replaces one rglob traversal per pattern).
+    """
+    buckets: Dict[str, List[os.DirEntry]] = {"code_files": [], "configs": [], "docs": [], "tests": []}
+    stack = [str(base_dir)]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                    continue
+                if not entry.is_file():
+                    continue
+                ext = os.path.splitext(entry.name)[1]
+                if ext == ".py":
+                    buckets["code_files"].append(entry)
+                    if entry.name.startswith("test_"):
+                        buckets["tests"].append(entry)
+                elif ext in _CONFIG_EXTS:
+                    buckets["configs"].append(entry)
+                elif ext in _DOC_EXTS:
+                    buckets["docs"].append(entry)
+    return buckets
+
+# (path, max_length) -> (mtime_ns, size, content); one entry per file, replaced when the file changes
+_read_cache: Dict[tuple, tuple] = {}
+
+def _cached_read(path: str, mtime_ns: int, size: int, max_length: int) -> str:
+    key = (path, max_length)
+    hit = _read_cache.get(key)
+    if hit is not None and hit[0] == mtime_ns and hit[1] == size:
+        return hit[2]
+    content = safe_read(Path(path), max_length=max_length)
+    _read_cache[key] = (mtime_ns, size, content)
+    return content
+
+def _load_entries(
+    entries: List[os.DirEntry], context_key: str, context: Dict[str, Any], max_length: int = MAX_LENGTH
+) -> None:
+    for entry in entries:
+        try:
+            st = entry.stat()
+            context[context_key][entry.name] = _cached_read(entry.path, st.st_mtime_ns, st.st_size, max_length)
+        except Exception as e:
+            publish_event('error', {'agent': 'context_loader', 'error': str(e), 'timestamp': datetime.datetime.now().isoformat()})  # [event_bus hook]
+            logging.error(f"Error loading file {entry.path}: {e}")
+
 def load_json_file(file_path: Path) -> Dict[str, Any]:
     try:
-        with file_path.open(encoding="utf-8") as f:
-            return json.load(f)
+        with file_path.open("rb") as f:
+            return loads_json(f.read())
     except Exception as e:
         publish_event('error', {'agent': 'context_loader', 'error': str(e), 'timestamp': datetime.datetime.now().isoformat()})  # [event_bus hook]
         logging.error(f"Error loading JSON file {file_path}: {e}")
         return {}
 
+def load_memory(file_path: Path, limit: int = MEMORY_CHANGES_LIMIT) -> Dict[str, Any]:
+    """
+    Load memory.json keeping only the last `limit` code_changes entries.
+    With ijson installed the file is streamed in one pass, so the change list costs
+    one entry plus the retained tail rather than the whole history.
+    """
+    if ijson is None:
+        memory = load_json_file(file_path)
+        if isinstance(memory.get("code_changes"), list):
+            memory["code_changes"] = memory["code_changes"][-limit:]
+        return memory
+    try:
+        # One pass: code_changes items are built one at a time into the bounded deque,
+        # everything else goes to the memory dict as usual.
+        memory_builder, item = ijson.ObjectBuilder(), None
+        changes = collections.deque(maxlen=limit)
+        in_changes = False
+        with file_path.open("rb") as f:
+            for prefix, event, value in ijson.parse(f, use_float=True):
+                if in_changes and prefix.startswith("code_changes.item"):
+                    if item is None:
+                        item = ijson.ObjectBuilder()
+                    item.event(event, value)
+                    if not item.containers:
+                        changes.append(item.value)
+                        item = None
+                    continue
+                if prefix == "code_changes" and event in ("start_array", "end_array"):
+                    in_changes = event == "start_array"
+                memory_builder.event(event, value)
+        memory = memory_builder.value
+        if not isinstance(memory, dict):
+            return {}
+        if isinstance(memory.get("code_changes"), list):
+            memory["code_changes"] = list(changes)
+        return memory
+    except Exception as e:
+        publish_event('error', {'agent': 'context_loader', 'error': str(e), 'timestamp': datetime.datetime.now().isoformat()})  # [event_bus hook]
+        logging.error(f"Error streaming JSON file {file_path}: {e}")
+        return {}
+
 def load_app_context(app_name: str) -> Dict[str, Any]:
     """
     Load the full app context for a given app_name:
@@ -119,20 +234,25 @@ def load_app_context(app_name: str) -> Dict[str, Any]:
 
     _log_action("load_app_context_start", {"app_name": app_name})
 
+    files = _scan_app_files(base_dir)
+
     # Load code files
-    load_files(base_dir, ["*.py", "test_*.py"], "code_files", context)
+    _load_entries(files["code_files"], "code_files", context)
 
     # Load config files including .env (mask secrets)
-    load_files(base_dir, ["*.json", "*.yaml", "*.yml", "*.ini"], "configs", context)
+    _load_entries(files["configs"], "configs", context)
     env_path = base_dir / ".env"
     if env_path.exists():
         context["configs"][".env"] = load_env(env_path)
 
-    # Load last 5 log files (any extension) from logs/
+    # Load the 5 most recently modified log files (any extension) from logs/
     logs_dir = base_dir / "logs"
     if logs_dir.exists():
-        log_files = sorted(logs_dir.glob("*"))[-LOG_COUNT:]
-        for log_file in log_files:
+        # One stat per entry; keep only the LOG_COUNT newest instead of sorting them all
+        with os.scandir(logs_dir) as it:
+            entries = [(e.stat().st_mtime, e.path) for e in it if e.is_file()]
+        for _, log_path in sorted(heapq.nlargest(LOG_COUNT, entries)):
+            log_file = Path(log_path)
             context["logs"].append(
                 {"file": log_file.name, "content": safe_read(log_file)}
             )
@@ -148,21 +268,35 @@ def load_app_context(app_name: str) -> Dict[str, Any]:
         context["metrics"] = load_json_file(metrics_path)
 
     # Load documentation files
-    load_files(base_dir, ["*.md", "*.txt"], "docs", context)
+    _load_entries(files["docs"], "docs", context)
 
     # Load persistent agent memory
     memory_path = base_dir / "memory.json"
     if memory_path.exists():
-        context["memory"] = load_json_file(memory_path)
+        context["memory"] = load_memory(memory_path)
+    # Code changes not yet compacted into memory.json by the Coder
+    memory_log = base_dir / "memory_log.jsonl"
+    if memory_log.exists():
+        changes = collections.deque(context["memory"].get("code_changes", []), maxlen=MEMORY_CHANGES_LIMIT)
+        changes.extend(iter_jsonl(str(memory_log)))
+        context["memory"]["code_changes"] = list(changes)
+    # Deployment history appended by the Deployer
+    deployments_log = base_dir / "memory.deployments.jsonl"
+    if deployments_log.exists():
+        deployments = collections.deque(context["memory"].get("deployments", []), maxlen=MEMORY_CHANGES_LIMIT)
+        deployments.extend(iter_jsonl(str(deployments_log)))
+        context["memory"]["deployments"] = list(deployments)
 
     # Load truncated test files previews only
-    load_files(base_dir, ["test_*.py"], "tests", context, preview=True)
+    _load_entries(files["tests"], "tests", context, max_length=DATA_SAMPLE_MAX_LENGTH)
 
     # Load first two data sample files (truncate to DATA_SAMPLE_MAX_LENGTH)
     data_dir = base_dir / "data"
     if data_dir.exists():
-        data_files = sorted(data_dir.glob("*"))[:2]
-        for dfile in data_files:
+        with os.scandir(data_dir) as it:
+            names = [e.name for e in it if e.is_file() and os.path.splitext(e.name)[1].lower() in DATA_SAMPLE_EXTS]
+        for name in heapq.nsmallest(2, names):
+            dfile = data_dir / name
             key = dfile.name
             context["data_samples"][key] = safe_read(dfile, max_length=DATA_SAMPLE_MAX_LENGTH)
 
@@ -1,18 +1,22 @@
 # agent/deploy_tools.py
 import os
+import string
 import subprocess
+from pathlib import Path
 from termcolor import cprint
 
-def write_dockerfile(project_dir, python_version="3.10"):
-    dockerfile = f"""
-FROM python:{python_version}-slim
+_DOCKERFILE_TMPL = string.Template("""
+FROM python:${python_version}-slim
 WORKDIR /app
 COPY . /app
 RUN pip install --upgrade pip && pip install -r requirements.txt
 CMD ["python", "main.py"]
-"""
-    with open(os.path.join(project_dir, "Dockerfile"), "w") as f:
-        f.write(dockerfile.strip())
+""".strip())
+
+def write_dockerfile(project_dir, python_version="3.10"):
+    Path(project_dir, "Dockerfile").write_text(
+        _DOCKERFILE_TMPL.substitute(python_version=python_version), encoding="utf-8"
+    )
 
 def build_and_run_docker(project_dir):
     tag = os.path.basename(project_dir).lower()
@@ -21,30 +25,32 @@ def build_and_run_docker(project_dir):
     cprint(f"Running Docker container '{tag}'...", "cyan")
     subprocess.run(["docker", "run", "--rm", "-it", tag], check=True)
 
-def write_k8s_yaml(project_dir, app_name):
-    k8s_yaml = f"""
+_K8S_TMPL = string.Template("""
 apiVersion: apps/v1
 kind: Deployment
 metadata:
-  name: {app_name}
+  name: ${app_name}
 spec:
   replicas: 1
   selector:
     matchLabels:
-      app: {app_name}
+      app: ${app_name}
   template:
     metadata:
       labels:
-        app: {app_name}
+        app: ${app_name}
     spec:
       containers:
-      - name: {app_name}
-        image: {app_name}:latest
+      - name: ${app_name}
+        image: ${app_name}:latest
         ports:
         - containerPort: 80
-"""
-    with open(os.path.join(project_dir, "k8s-deploy.yaml"), "w") as f:
-        f.write(k8s_yaml.strip())
+""".strip())
+
+def write_k8s_yaml(project_dir, app_name):
+    Path(project_dir, "k8s-deploy.yaml").write_text(
+        _K8S_TMPL.substitute(app_name=app_name), encoding="utf-8"
+    )
 
 def apply_k8s(project_dir):
     yaml_file = os.path.join(project_dir, "k8s-deploy.yaml")
@@ -1,16 +1,27 @@
+import asyncio
+import contextlib
 import datetime
-import json
+import hashlib
 import logging
 import os
+import select
 import shutil
+import signal
 import subprocess
 import sys
+import threading
 import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Callable, List, Optional, Dict, Any
+from typing import Awaitable, Callable, Iterator, List, Optional, Dict, Any
 from agent.event_bus import publish_event, publish_response, start_listener_in_thread
+from agent.utils import (
+    append_jsonl, atomic_write_bytes, dumps_json_bytes, fast_copy, iter_jsonl, load_json_file, save_json_file,
+)
 
 import requests  # Ensure requests library is installed
+from requests.adapters import HTTPAdapter
 
 try:
     from termcolor import cprint
@@ -18,9 +29,28 @@ except ImportError:
     def cprint(msg, color=None, **kwargs): print(msg)
 
 # Configuration
-DEPLOYER_LOG = "logs/deployer_activity.json"
+DEPLOYER_LOG = "logs/deployer_activity.jsonl"
 BACKUP_ROOT = "logs/agent_backups/deployer"
+BACKUP_BUFFER_SIZE = 1 << 20
+BACKUP_WORKERS = 8
+BACKUP_INDEX_ENTRIES = 32  # source-tree hashes remembered per app for backup reuse
+ZIP64_LIMIT = (1 << 31) - 1
 RETRIES = 3
+STATUS_URL = "http://localhost:8000/status"
+DEPLOYMENTS_LOG = "memory.deployments.jsonl"  # per-app append-only deployment history
+_APPS_ROOT = Path(__file__).resolve().parent.parent / "apps"  # resolved once at import
+HEALTH_CHECK_DEADLINE = 10  # seconds for all health subchecks together
+STARTUP_DEADLINE = 10  # seconds deploy_app waits for /status after starting the app
+PID_FILE = ".bot.pid"  # written by start_process, read by health_check
+KILL_TIMEOUT = 5  # seconds between SIGTERM and SIGKILL
+PROCESS_TERMINATE = 0x0001
+PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+STILL_ACTIVE = 259
+
+# Shared keep-alive session: readiness probes and health checks reuse one pooled connection
+_SESSION = requests.Session()
+_SESSION.mount("http://", HTTPAdapter(pool_connections=2, pool_maxsize=4))
+_SESSION.headers["Connection"] = "keep-alive"
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -28,124 +58,317 @@ logging.basicConfig(
 
 def _log_action(action: str, details: dict = None):
     os.makedirs(os.path.dirname(DEPLOYER_LOG), exist_ok=True)
-    if os.path.exists(DEPLOYER_LOG):
-        with open(DEPLOYER_LOG, encoding="utf-8") as f:
-            all_logs = json.load(f)
-    else:
-        all_logs = []
     entry = {
         "timestamp": datetime.datetime.now().isoformat(),
         "action": action,
         "details": details or {}
     }
-    all_logs.append(entry)
-    with open(DEPLOYER_LOG, "w", encoding="utf-8") as f:
-        json.dump(all_logs, f, indent=2)
+    append_jsonl(DEPLOYER_LOG, entry)
+
+def _read_log():
+    """Yield logged deployer actions, oldest first."""
+    return iter_jsonl(DEPLOYER_LOG)
+
+def _content_hash(app_dir: Path) -> str:
+    """BLAKE2b over the relative path and bytes of every file in app_dir outside logs/."""
+    h = hashlib.blake2b(digest_size=16)
+    for root, dirs, files in os.walk(app_dir):
+        dirs.sort()
+        if os.path.samefile(root, app_dir):
+            dirs[:] = [d for d in dirs if d != "logs"]
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            h.update(f"{os.path.relpath(path, app_dir)}\0{os.path.getsize(path)}\0".encode("utf-8"))
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(BACKUP_BUFFER_SIZE), b""):
+                    h.update(chunk)
+    return h.hexdigest()
 
 class Deployer:
     @staticmethod
     def backup_folder(src: str, backup_dir: str) -> str:
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
         base_name = f"{Path(src).name}_bak_{timestamp}"
-        bak_path = Path(backup_dir) / base_name
-        shutil.make_archive(str(bak_path), "zip", src)
-        return str(bak_path) + ".zip"
+        zip_path = Path(backup_dir) / f"{base_name}.zip"
+        # Same-host, short-lived backup: STORED skips DEFLATE CPU and 1 MiB copies cut syscalls.
+        zip_abs = os.path.abspath(zip_path)
+        with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_STORED) as zf:
+            for root, dirs, files in os.walk(src):
+                for name in sorted(dirs):
+                    path = os.path.join(root, name)
+                    zf.write(path, os.path.relpath(path, src))
+                for name in sorted(files):
+                    path = os.path.join(root, name)
+                    if os.path.abspath(path) == zip_abs:
+                        continue  # backup_dir may live inside src
+                    zinfo = zipfile.ZipInfo.from_file(path, os.path.relpath(path, src))
+                    with open(path, "rb") as fsrc, zf.open(zinfo, "w", force_zip64=zinfo.file_size > ZIP64_LIMIT) as fdst:
+                        shutil.copyfileobj(fsrc, fdst, BACKUP_BUFFER_SIZE)
+        return str(zip_path)
 
     @staticmethod
     def backup_all_py_files(app_dir: Path) -> List[str]:
         backup_dir = Path(BACKUP_ROOT) / app_dir.name
         backup_dir.mkdir(parents=True, exist_ok=True)
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        backups = []
-        for file in app_dir.glob("*.py"):
-            bak = backup_dir / f"{file.stem}_{timestamp}{file.suffix}"
-            shutil.copyfile(file, bak)
-            backups.append(str(bak))
+        pairs = [(file, backup_dir / f"{file.stem}_{timestamp}{file.suffix}") for file in app_dir.glob("*.py")]
+        # Copies are I/O-bound: issue them concurrently (copy_file_range/sendfile via fast_copy)
+        with ThreadPoolExecutor(max_workers=BACKUP_WORKERS) as executor:
+            list(executor.map(lambda pair: fast_copy(*pair), pairs))
+        backups = [str(bak) for _, bak in pairs]
         logging.info(f"Backed up all .py files for {app_dir.name} to {backup_dir}")
         return backups
 
     @staticmethod
-    def health_check(app_name: str, custom_checks: Optional[List[Callable[[], bool]]] = None) -> bool:
-        results = []
-        # 1. HTTP check (simple)
+    async def _run_check(name: str, check: Awaitable[bool]) -> bool:
         try:
-            resp = requests.get("http://localhost:8000/status", timeout=3)
-            results.append(resp.status_code == 200)
+            return bool(await check)
         except Exception as e:
             publish_event('error', {'agent': 'deployer', 'error': str(e), 'timestamp': datetime.datetime.now().isoformat()})  # [event_bus hook]
-            logging.error(f"HTTP check failed: {e}")
-            results.append(False)
+            logging.error(f"{name} check failed: {e}")
+            return False
+
+    @staticmethod
+    def _read_pid(app_dir: Path) -> Optional[int]:
+        try:
+            return int((app_dir / PID_FILE).read_text().strip())
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _pid_running(pid: int, needle: str) -> bool:
+        """Check pid is alive (and on Linux, that its cmdline mentions needle) without spawning ps/tasklist."""
+        if sys.platform == "win32":
+            import ctypes
+            kernel32 = ctypes.windll.kernel32
+            handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+            if not handle:
+                return False
+            try:
+                code = ctypes.c_ulong()
+                return bool(kernel32.GetExitCodeProcess(handle, ctypes.byref(code))) and code.value == STILL_ACTIVE
+            finally:
+                kernel32.CloseHandle(handle)
+        proc = Path(f"/proc/{pid}")
+        if proc.is_dir():
+            try:
+                return needle.encode() in (proc / "cmdline").read_bytes()
+            except OSError:
+                return False
+        try:
+            os.kill(pid, 0)  # no /proc (macOS/BSD): signal 0 only probes existence
+            return True
+        except PermissionError:
+            return True
+        except OSError:
+            return False
+
+    @staticmethod
+    async def health_check_async(app_name: str, custom_checks: Optional[List[Callable[[], bool]]] = None) -> bool:
+        loop = asyncio.get_running_loop()
+        # Sync work (custom checks, the /status request) gets its own pool so a check that
+        # overruns the deadline is abandoned instead of holding up loop shutdown.
+        executor = ThreadPoolExecutor(max_workers=len(custom_checks or []) + 1)
+
+        # 1. HTTP check (simple)
+        async def http_check() -> bool:
+            # Same keep-alive session as the startup probes, so the pooled connection is reused
+            resp = await loop.run_in_executor(
+                executor, lambda: _SESSION.get(STATUS_URL, timeout=3)
+            )
+            return resp.status_code == 200
 
         # 2. Process check: look for running python bot.py process
-        app_dir = Path(__file__).resolve().parent.parent / "apps" / app_name
+        app_dir = _APPS_ROOT / app_name
         main_file = str(app_dir / "bot.py")
-        try:
+
+        async def process_check() -> bool:
+            pid = Deployer._read_pid(app_dir)
+            if pid is not None:
+                return Deployer._pid_running(pid, "bot.py")
+            # No pidfile (app started outside the deployer): scan the process table
             if sys.platform == "win32":
-                output = subprocess.check_output(
-                    ["tasklist", "/FI", "IMAGENAME eq python.exe", "/V"], text=True
-                )
-                results.append("bot.py" in output)
+                cmd, needle = ["tasklist", "/FI", "IMAGENAME eq python.exe", "/V"], "bot.py"
             else:
-                output = subprocess.check_output(["ps", "aux"], text=True)
-                results.append(main_file in output)
-        except Exception as e:
-            publish_event('error', {'agent': 'deployer', 'error': str(e), 'timestamp': datetime.datetime.now().isoformat()})  # [event_bus hook]
-            logging.error(f"Process check failed: {e}")
-            results.append(False)
+                cmd, needle = ["ps", "aux"], main_file
+            proc = await asyncio.create_subprocess_exec(*cmd, stdout=asyncio.subprocess.PIPE)
+            try:
+                output, _ = await proc.communicate()
+            finally:
+                if proc.returncode is None:
+                    proc.kill()
+            return needle in output.decode(errors="replace")
 
         # 3. Custom additional checks if provided
-        if custom_checks:
-            for fn in custom_checks:
-                try:
-                    results.append(fn())
-                except Exception as e:
-                    publish_event('error', {'agent': 'deployer', 'error': str(e), 'timestamp': datetime.datetime.now().isoformat()})  # [event_bus hook]
-                    logging.error(f"Custom check failed: {e}")
-                    results.append(False)
+        checks = [("HTTP", http_check()), ("Process", process_check())]
+        checks += [("Custom", loop.run_in_executor(executor, fn)) for fn in custom_checks or []]
 
-        return all(results)
+        # Run all checks concurrently: latency is the slowest check, not the sum.
+        # Fail closed on the first failure or when the deadline passes.
+        tasks = {asyncio.ensure_future(Deployer._run_check(name, check)): name for name, check in checks}
+        healthy = True
+        try:
+            for fut in asyncio.as_completed(tasks, timeout=HEALTH_CHECK_DEADLINE):
+                if not await fut:
+                    healthy = False
+                    break
+        except asyncio.TimeoutError:
+            pending = [name for task, name in tasks.items() if not task.done()]
+            logging.error(f"Health checks timed out after {HEALTH_CHECK_DEADLINE}s: {pending}")
+            healthy = False
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            executor.shutdown(wait=False, cancel_futures=True)
+        return healthy
+
+    @staticmethod
+    def health_check(app_name: str, custom_checks: Optional[List[Callable[[], bool]]] = None) -> bool:
+        """Synchronous wrapper around health_check_async."""
+        return asyncio.run(Deployer.health_check_async(app_name, custom_checks))
+
+    @staticmethod
+    def _terminate_pid(pid: int, timeout: float = KILL_TIMEOUT) -> None:
+        """SIGTERM pid, wait up to timeout for it to exit, then SIGKILL (TerminateProcess on Windows)."""
+        if sys.platform == "win32":
+            import ctypes
+            kernel32 = ctypes.windll.kernel32
+            handle = kernel32.OpenProcess(PROCESS_TERMINATE, False, pid)
+            if handle:
+                try:
+                    kernel32.TerminateProcess(handle, 1)
+                finally:
+                    kernel32.CloseHandle(handle)
+            return
+        os.kill(pid, signal.SIGTERM)
+        end = time.monotonic() + timeout
+        while time.monotonic() < end:
+            try:
+                if os.waitpid(pid, os.WNOHANG)[0]:
+                    return  # our child: exited and reaped
+            except ChildProcessError:
+                pass  # started by another deployer process; fall back to probing
+            if not Deployer._pid_running(pid, "bot.py"):
+                return
+            time.sleep(0.05)
+        logging.warning(f"Process {pid} ignored SIGTERM for {timeout}s; sending SIGKILL.")
+        os.kill(pid, signal.SIGKILL)
 
     @staticmethod
     def kill_process(app_dir: str, main_file: str) -> None:
         try:
-            if sys.platform == "win32":
+            pid = Deployer._read_pid(Path(app_dir))
+            if pid is not None:
+                # Signal the recorded pid directly; no shell or pkill fork
+                if Deployer._pid_running(pid, Path(main_file).name):
+                    Deployer._terminate_pid(pid)
+            elif sys.platform == "win32":
                 subprocess.call(
-                    ["taskkill", "/F", "/FI", f"WINDOWTITLE eq {Path(main_file).name}"],
-                    shell=True,
+                    ["taskkill", "/F", "/FI", f"WINDOWTITLE eq {Path(main_file).name}"]
                 )
             else:
-                subprocess.call(["pkill", "-f", main_file], shell=True)
+                subprocess.call(["pkill", "-f", main_file])
+            (Path(app_dir) / PID_FILE).unlink(missing_ok=True)
+        except ProcessLookupError:
+            (Path(app_dir) / PID_FILE).unlink(missing_ok=True)
         except Exception as e:
             publish_event('error', {'agent': 'deployer', 'error': str(e), 'timestamp': datetime.datetime.now().isoformat()})  # [event_bus hook]
             logging.error(f"Failed to kill process: {e}")
 
     @staticmethod
-    def start_process(app_dir: str, main_file: str) -> None:
+    def start_process(app_dir: str, main_file: str) -> Optional[subprocess.Popen]:
         try:
             if sys.platform == "win32":
-                subprocess.Popen(
+                proc = subprocess.Popen(
                     ["python", main_file],
                     cwd=app_dir,
                     creationflags=subprocess.DETACHED_PROCESS
                     | subprocess.CREATE_NEW_PROCESS_GROUP,
                 )
             else:
-                subprocess.Popen(
+                proc = subprocess.Popen(
                     ["nohup", "python", main_file],
                     cwd=app_dir,
                     stdout=subprocess.DEVNULL,
                     stderr=subprocess.DEVNULL,
                     preexec_fn=os.setpgrp,  # Detach process group on Unix
                 )
+            # nohup execs python in place, so this pid is the app itself
+            (Path(app_dir) / PID_FILE).write_text(str(proc.pid))
+            return proc
         except Exception as e:
             publish_event('error', {'agent': 'deployer', 'error': str(e), 'timestamp': datetime.datetime.now().isoformat()})  # [event_bus hook]
             logging.error(f"Failed to start process: {e}")
+            return None
+
+    @staticmethod
+    @contextlib.contextmanager
+    def _exit_waiter(proc: subprocess.Popen) -> Iterator[Callable[[float], bool]]:
+        """
+        Yield wait(timeout) -> True if proc exited within timeout. Blocks on a pidfd (Linux)
+        or kqueue NOTE_EXIT (macOS/BSD) so a crash is seen immediately; else plain sleep + poll.
+        The pidfd / kqueue is closed when the block exits.
+        """
+        if hasattr(os, "pidfd_open"):
+            try:
+                pidfd = os.pidfd_open(proc.pid)
+            except OSError:
+                pidfd = None
+            if pidfd is not None:
+                try:
+                    poller = select.poll()
+                    poller.register(pidfd, select.POLLIN)
+                    yield lambda timeout: bool(poller.poll(timeout * 1000)) or proc.poll() is not None
+                finally:
+                    os.close(pidfd)
+                return
+        if hasattr(select, "kqueue"):
+            kq = select.kqueue()
+            try:
+                ev = select.kevent(proc.pid, filter=select.KQ_FILTER_PROC, flags=select.KQ_EV_ADD, fflags=select.KQ_NOTE_EXIT)
+                kq.control([ev], 0, 0)
+            except OSError:
+                kq.close()
+                kq = None
+            if kq is not None:
+                try:
+                    yield lambda timeout: bool(kq.control(None, 1, timeout)) or proc.poll() is not None
+                finally:
+                    kq.close()
+                return
+
+        def wait(timeout: float) -> bool:
+            time.sleep(timeout)
+            return proc.poll() is not None
+        yield wait
+
+    @staticmethod
+    def wait_until_ready(proc: Optional[subprocess.Popen], deadline: float = STARTUP_DEADLINE) -> bool:
+        """Poll /status with exponential backoff until 200, the process dies, or deadline passes."""
+        if proc is None:
+            return False
+        delay = 0.1
+        end = time.monotonic() + deadline
+        with Deployer._exit_waiter(proc) as wait_exit:
+            while time.monotonic() < end:
+                if wait_exit(min(delay, max(end - time.monotonic(), 0))):
+                    logging.error(f"App process exited during startup (code {proc.poll()}).")
+                    return False
+                try:
+                    if _SESSION.get(STATUS_URL, timeout=1).status_code == 200:
+                        return True
+                except Exception:
+                    pass  # not listening yet
+                delay = min(delay * 2, 1.0)
+        logging.warning(f"App not ready after {deadline}s; continuing to health check.")
+        return False
 
     @staticmethod
     def deploy_app(app_name: str) -> None:
         from agent.tester import Tester
 
-        app_dir = Path(__file__).resolve().parent.parent / "apps" / app_name
+        app_dir = _APPS_ROOT / app_name
         logs_dir = app_dir / "logs"
         logs_dir.mkdir(exist_ok=True)
 
@@ -157,9 +380,22 @@ class Deployer:
         logging.info("Running pre-deploy tests...")
         Tester.run_tests(app_name, auto_generate=False)
         logging.info("Backing up all .py files and app folder...")
-        backup_paths = Deployer.backup_all_py_files(app_dir)
-        backup_zip = Deployer.backup_folder(str(app_dir), backup_dir=str(logs_dir))
-        logging.info(f"Backups created: {backup_paths} and {backup_zip}")
+        # Content-addressed: an app whose files are byte-for-byte unchanged reuses the previous backups
+        tree_hash = _content_hash(app_dir)
+        index_path = str(Path(BACKUP_ROOT) / app_dir.name / "index.json")
+        index = load_json_file(index_path)
+        cached = index.get(tree_hash)
+        if cached and os.path.exists(cached["backup_zip"]):
+            backup_paths, backup_zip = cached["backup_paths"], cached["backup_zip"]
+            logging.info(f"App contents unchanged; reusing backups {backup_zip}")
+        else:
+            backup_paths = Deployer.backup_all_py_files(app_dir)
+            backup_zip = Deployer.backup_folder(str(app_dir), backup_dir=str(logs_dir))
+            index[tree_hash] = {"backup_paths": backup_paths, "backup_zip": backup_zip}
+            for stale in list(index)[:-BACKUP_INDEX_ENTRIES]:
+                del index[stale]
+            save_json_file(index_path, index)
+            logging.info(f"Backups created: {backup_paths} and {backup_zip}")
 
         # --- Git update if .git exists
         git_updated = False
@@ -179,8 +415,8 @@ class Deployer:
         logging.info("Stopping previous app process (if any)...")
         Deployer.kill_process(str(app_dir), str(main_file))
         logging.info("Starting app process...")
-        Deployer.start_process(str(app_dir), str(main_file))
-        time.sleep(5)  # Give app time to start
+        proc = Deployer.start_process(str(app_dir), str(main_file))
+        Deployer.wait_until_ready(proc)
 
         # --- Post-deploy tests and health check
         logging.info("Running post-deploy tests and health check...")
@@ -218,27 +454,25 @@ class Deployer:
             "app_dir": str(app_dir),
         }
         log_path = logs_dir / f"deploy_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
-        with open(log_path, "w", encoding="utf-8") as logf:
-            json.dump(deploy_info, logf, indent=2)
+        atomic_write_bytes(str(log_path), dumps_json_bytes(deploy_info, indent=True))
         _log_action("deploy_app", deploy_info)
 
-        # --- Append deployment record to memory.json
-        mem_path = app_dir / "memory.json"
+        # --- Append deployment record to the app's deployments log (sidecar of memory.json)
         try:
-            mem = {}
-            if mem_path.exists():
-                with open(mem_path, encoding="utf-8") as mf:
-                    mem = json.load(mf)
-            mem.setdefault("deployments", []).append(deploy_info)
-            with open(mem_path, "w", encoding="utf-8") as mf:
-                json.dump(mem, mf, indent=2)
+            append_jsonl(str(app_dir / DEPLOYMENTS_LOG), deploy_info)
         except Exception as e:
             publish_event('error', {'agent': 'deployer', 'error': str(e), 'timestamp': datetime.datetime.now().isoformat()})  # [event_bus hook]
-            logging.error(f"Failed to update memory.json: {e}")
+            logging.error(f"Failed to record deployment: {e}")
+
+    @staticmethod
+    def load_deployments(app_dir: Path) -> List[Dict[str, Any]]:
+        """All deployment records: legacy memory.json["deployments"] followed by the JSONL log."""
+        mem = load_json_file(str(app_dir / "memory.json"))
+        return list(mem.get("deployments", [])) + list(iter_jsonl(str(app_dir / DEPLOYMENTS_LOG)))
 
     @staticmethod
     def explain_last_deploy(app_name: str) -> None:
-        app_dir = Path(__file__).resolve().parent.parent / "apps" / app_name
+        app_dir = _APPS_ROOT / app_name
         logs_dir = app_dir / "logs"
         if not logs_dir.exists():
             logging.info("No logs directory found for this app.")
@@ -264,4 +498,13 @@ def handle_deploy_request(event):
     result = {"status": "handled", "details": f"deploy_request handled by agent."}
     publish_response("deploy_result", result, correlation_id=event.get("correlation_id"))
 
-start_listener_in_thread(handle_deploy_request, event_types=["deploy_request"])
+def register_event_handlers():
+    """Start the Deployer's event-bus listener (a no-op if already running)."""
+    start_listener_in_thread(handle_deploy_request, event_types=["deploy_request"])
+
+if os.environ.get("AGENT_LISTEN") == "1":
+    register_event_handlers()
+
+if __name__ == "__main__":
+    register_event_handlers()
+    threading.Event().wait()
@@ -2,23 +2,33 @@
 
 import os
 import shutil
+import signal
 import subprocess
 import logging
 import re
-from typing import Tuple, Dict, Optional
+from typing import Tuple, Dict, List, Optional
 from pathlib import Path
 import datetime
-import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from agent.event_bus import publish_event
+from agent.utils import append_jsonl, get_openai_client, iter_jsonl, load_json_file, save_json_file, source_tree_hash
 
 try:
     from termcolor import cprint
 except ImportError:
     def cprint(msg, color=None, **kwargs): print(msg)
 
-FIXER_LOG = "logs/devops_fixer_activity.json"
+FIXER_LOG = "logs/devops_fixer_activity.jsonl"
 BACKUP_ROOT = "logs/agent_backups/devops_fixer"
 RETRIES = 3
+LINT_CACHE = "logs/devops_fixer_lintcache.json"
+LINT_CACHE_ENTRIES = 16
+AI_FIX_WORKERS = 4
+COMMAND_TIMEOUT = 120  # seconds; default bound for formatters, git, etc.
+LINTER_TIMEOUTS = {"flake8": 30, "mypy": 120, "bandit": 60}
+TEST_TIMEOUT = 300
+_AGENT_ROOT = Path(__file__).resolve().parent  # resolved once at import
+_LINT_RE = re.compile(r"^(.+?):\d+:\d+:", re.MULTILINE)  # "path:line:col:" prefix of a linter line
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -26,19 +36,16 @@ logging.basicConfig(
 
 def _log_action(action: str, details: dict = None):
     os.makedirs(os.path.dirname(FIXER_LOG), exist_ok=True)
-    if os.path.exists(FIXER_LOG):
-        with open(FIXER_LOG, encoding="utf-8") as f:
-            all_logs = json.load(f)
-    else:
-        all_logs = []
     entry = {
         "timestamp": datetime.datetime.now().isoformat(),
         "action": action,
         "details": details or {}
     }
-    all_logs.append(entry)
-    with open(FIXER_LOG, "w", encoding="utf-8") as f:
-        json.dump(all_logs, f, indent=2)
+    append_jsonl(FIXER_LOG, entry)
+
+def _read_log():
+    """Yield logged devops_fixer actions, oldest first."""
+    return iter_jsonl(FIXER_LOG)
 
 def backup_file(file_path: Path) -> Optional[Path]:
     try:
@@ -58,28 +65,59 @@ def backup_file(file_path: Path) -> Optional[Path]:
         logging.error(f"Backup failed: {e}")
     return None
 
-def run_command(cmd: list, cwd: Optional[Path] = None) -> Tuple[bool, str]:
-    """Run shell command, return (success, output)."""
+def run_command(cmd: list, cwd: Optional[Path] = None, timeout: float = COMMAND_TIMEOUT) -> Tuple[bool, str, bool]:
+    """
+    Run shell command, return (success, output, timed_out). Killed (with its children)
+    after timeout seconds; output then holds whatever it printed before the kill.
+    """
+    proc = subprocess.Popen(
+        cmd, cwd=str(cwd) if cwd else None, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        text=True, start_new_session=(os.name == "posix"),
+    )
     try:
-        result = subprocess.run(
-            cmd, cwd=str(cwd) if cwd else None, capture_output=True, text=True, check=True
-        )
-        return True, result.stdout + result.stderr
-    except subprocess.CalledProcessError as e:
-        logging.error(f"Command failed: {e}")
-        return False, (e.stdout or "") + (e.stderr or "")
+        stdout, stderr = proc.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        if os.name == "posix":
+            os.killpg(proc.pid, signal.SIGKILL)  # own session: take down worker children too
+        else:
+            proc.kill()
+        stdout, stderr = proc.communicate()
+        logging.error(f"Command timed out after {timeout}s: {' '.join(cmd)}")
+        return False, (stdout or "") + (stderr or ""), True
+    if proc.returncode != 0:
+        logging.error(f"Command failed: {cmd} returned non-zero exit status {proc.returncode}.")
+        return False, (stdout or "") + (stderr or ""), False
+    return True, stdout + stderr, False
 
 def run_linters(agent_dir: Path) -> Dict[str, str]:
-    """Run static code linters and collect their output."""
+    """Run static code linters and collect their output (cached per source-tree hash)."""
+    tree_hash = source_tree_hash(agent_dir)
+    cache = load_json_file(LINT_CACHE)
+    key = f"{agent_dir}:{tree_hash}"
+    if key in cache:
+        logging.info(f"Source tree unchanged; reusing cached linter output for {agent_dir}")
+        return cache[key]
+
     linters = {
         "flake8": ["flake8", str(agent_dir)],
         "mypy": ["mypy", str(agent_dir)],
         "bandit": ["bandit", "-r", str(agent_dir)],
     }
-    outputs = {}
-    for name, cmd in linters.items():
-        _, output = run_command(cmd, cwd=agent_dir)
-        outputs[name] = output
+    # Separate processes, so threads just wait on them: wall time is the slowest linter
+    with ThreadPoolExecutor(max_workers=len(linters)) as executor:
+        futures = {
+            executor.submit(run_command, cmd, agent_dir, LINTER_TIMEOUTS[name]): name
+            for name, cmd in linters.items()
+        }
+        results = {futures[fut]: fut.result() for fut in as_completed(futures)}
+    outputs = {name: results[name][1] for name in linters}
+
+    if any(timed_out for _, _, timed_out in results.values()):
+        return outputs  # incomplete run: don't let it stick in the cache
+    cache[key] = outputs
+    for stale in list(cache)[:-LINT_CACHE_ENTRIES]:
+        del cache[stale]
+    save_json_file(LINT_CACHE, cache)
     return outputs
 
 def auto_fix_code(agent_dir: Path) -> None:
@@ -94,7 +132,7 @@ def auto_fix_code(agent_dir: Path) -> None:
 
 def run_tests(agent_dir: Path) -> bool:
     """Run pytest for the agent directory."""
-    ok, output = run_command(["pytest", str(agent_dir)])
+    ok, output, _ = run_command(["pytest", str(agent_dir)], timeout=TEST_TIMEOUT)
     if ok:
         cprint("✅ All tests passed.", "green")
     else:
@@ -105,15 +143,15 @@ def run_tests(agent_dir: Path) -> bool:
 def ai_fix_code_with_llm(file_path: Path, error_message: str, model: str = "gpt-4o") -> None:
     """Ask OpenAI to fix code based on linter errors and overwrite file."""
     try:
-        import openai
         api_key = os.environ.get("OPENAI_API_KEY")
         if not api_key:
             logging.error("OPENAI_API_KEY not found in environment.")
             return
-        client = openai.OpenAI(api_key=api_key)
-    except ImportError:
-        logging.warning("OpenAI SDK not installed; skipping LLM code fix.")
-        return
+        # Shared pooled client: concurrent per-file fixes reuse its connections
+        client = get_openai_client(api_key)
+        if client is None:
+            logging.warning("OpenAI SDK not installed; skipping LLM code fix.")
+            return
     except Exception as e:
         publish_event('error', {
             'agent': 'devops_fixer',
@@ -153,15 +191,23 @@ def ai_fix_code_with_llm(file_path: Path, error_message: str, model: str = "gpt-
 
 def fix_all_files_with_ai(agent_dir: Path, error_output: str, model: str = "gpt-4o") -> None:
     """Find all code files mentioned in linter output and fix them with LLM."""
-    files = set()
-    for match in re.finditer(r"(.+?):\d+:\d+:", error_output):
+    # Group error lines by file so each request carries only that file's errors
+    errors: Dict[Path, List[str]] = {}
+    for line in error_output.splitlines():
+        match = _LINT_RE.match(line)
+        if not match:
+            continue
         raw_path = match.group(1).strip()
         file_path = Path(raw_path) if Path(raw_path).is_absolute() else agent_dir / raw_path
-        if file_path.exists():
-            files.add(file_path)
+        errors.setdefault(file_path, []).append(line)
+    errors = {f: lines for f, lines in errors.items() if f.exists()}
+    if not errors:
+        return
 
-    for file in files:
-        ai_fix_code_with_llm(file, error_output, model)
+    # One request per file, issued concurrently: latency is the slowest fix, not the sum
+    with ThreadPoolExecutor(max_workers=min(len(errors), AI_FIX_WORKERS)) as executor:
+        for file, lines in errors.items():
+            executor.submit(ai_fix_code_with_llm, file, "\n".join(lines), model)
 
 def commit_fixes(agent_dir: Path, commit_message: str = "Auto-fixed AI agent code hygiene issues") -> None:
     """Commit code hygiene fixes to git."""
@@ -173,7 +219,7 @@ def auto_devops_fix(app_name: Optional[str] = None) -> None:
     DevOps Quick Fix on AI agent system code (agent/ folder or specific app).
     Fully tested, rollback-ready, and explainable.
     """
-    agent_dir = Path(__file__).resolve().parent if app_name is None else Path(__file__).resolve().parent / app_name
+    agent_dir = _AGENT_ROOT if app_name is None else _AGENT_ROOT / app_name
     _log_action("auto_devops_fix", {"dir": str(agent_dir)})
     if not agent_dir.is_dir():
         logging.error(f"Agent directory not found: {agent_dir}")
@@ -1,17 +1,24 @@
 import os
-import json
 import time
 import threading
 import uuid
 from pathlib import Path
 from typing import Callable, Dict, Any, List, Optional, Union
+from agent.utils import dumps_json_bytes, iter_jsonl, loads_json
+
+try:
+    import fcntl
+except ImportError:  # Windows: rely on O_APPEND single-write appends
+    fcntl = None
+
+try:
+    from watchfiles import watch  # inotify / FSEvents / ReadDirectoryChangesW
+except ImportError:
+    watch = None
 
 EVENTS_DIR = Path("events")
 EVENTS_DIR.mkdir(exist_ok=True)
-
-def _event_filename(event_type, ts=None):
-    ts = ts or time.time()
-    return EVENTS_DIR / f"event_{event_type}_{int(ts*1000)}_{uuid.uuid4().hex[:8]}.json"
+EVENTS_LOG = EVENTS_DIR / "events.jsonl"  # append-only journal, one event per line
 
 def publish_event(
     event_type: str,
@@ -22,7 +29,7 @@ def publish_event(
     is_response: bool = False
 ) -> Path:
     """
-    Publish an event to the events/ directory.
+    Publish an event by appending it to the events/ journal.
     Supports requests, responses, and regular events.
     """
     ts = time.time()
@@ -35,10 +42,13 @@ def publish_event(
         "is_request": is_request,
         "is_response": is_response
     }
-    fname = _event_filename(event_type, ts)
-    with open(fname, "w", encoding="utf-8") as f:
-        json.dump(event, f)
-    return fname
+    # Serialize first so an unserializable payload never touches the journal
+    line = dumps_json_bytes(event) + b"\n"
+    with open(EVENTS_LOG, "ab") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)  # one writer at a time across processes; released on close
+        f.write(line)
+    return EVENTS_LOG
 
 def publish_request(event_type: str, data: Dict[str, Any], parent_event: Optional[str] = None) -> str:
     correlation_id = str(uuid.uuid4())
@@ -48,40 +58,122 @@ def publish_request(event_type: str, data: Dict[str, Any], parent_event: Optiona
 def publish_response(event_type: str, data: Dict[str, Any], correlation_id: str, parent_event: Optional[str] = None):
     publish_event(event_type, data, correlation_id=correlation_id, parent_event=parent_event, is_response=True)
 
+def _is_event_file(name: str) -> bool:
+    return name.startswith("event_") and name.endswith(".json")
+
+def _event_ms(name: str) -> int:
+    """Millisecond timestamp from event_<type>_<ms>_<uuid>.json (type may contain '_')."""
+    try:
+        return int(name.rsplit("_", 2)[-2])
+    except (IndexError, ValueError):
+        return -1
+
+def legacy_event_files() -> List[str]:
+    """Paths of legacy one-file-per-event event_*.json files, oldest first."""
+    with os.scandir(EVENTS_DIR) as it:
+        return [path for _, path in sorted((_event_ms(e.name), e.path) for e in it if _is_event_file(e.name))]
+
+def iter_events():
+    """
+    Yield every stored event, oldest first: legacy one-file-per-event
+    event_*.json files, then the journal.
+    """
+    for path in legacy_event_files():
+        try:
+            with open(path, "rb") as f:
+                yield loads_json(f.read())
+        except Exception:
+            continue
+    yield from iter_jsonl(str(EVENTS_LOG))
+
+def read_journal(offset: int):
+    """Return (events after byte offset, offset just past the last complete line)."""
+    try:
+        size = os.stat(EVENTS_LOG).st_size
+    except FileNotFoundError:
+        return [], 0
+    if size == offset:
+        return [], offset
+    if size < offset:
+        offset = 0  # journal was truncated or replaced
+    with open(EVENTS_LOG, "rb") as f:
+        f.seek(offset)
+        chunk = f.read()
+    # A line still being appended has no newline yet; pick it up on the next read
+    end = chunk.rfind(b"\n") + 1
+    events = []
+    for line in chunk[:end].splitlines():
+        if not line.strip():
+            continue
+        try:
+            events.append(loads_json(line))
+        except ValueError:
+            continue
+    return events, offset + end
+
 def listen_events(
     callback: Callable[[Dict[str, Any]], None],
     event_types: Optional[List[str]] = None,
     correlation_id: Optional[str] = None,
-    poll_interval: float = 1.0
+    poll_interval: float = 1.0,
+    from_start: bool = False
 ):
     """
-    Continuously listen for new events in events/ directory.
+    Continuously listen for new events in the events/ journal.
     Can filter by event_types and/or correlation_id (request/response workflows).
+    Starts at the current end of the journal (from_start=True replays it) and remembers
+    its byte offset, so each wake-up reads only the new lines. Wakes on OS change
+    notifications via watchfiles when installed; otherwise polls every poll_interval seconds.
     """
-    seen = set()
-    while True:
-        files = sorted(EVENTS_DIR.glob("event_*.json"))
-        for file in files:
-            if file in seen:
-                continue
-            with open(file, encoding="utf-8") as f:
-                try:
-                    event = json.load(f)
-                except Exception:
-                    continue
+    offset = 0
+    if not from_start:
+        try:
+            offset = os.stat(EVENTS_LOG).st_size
+        except FileNotFoundError:
+            pass
+
+    def drain():
+        nonlocal offset
+        events, offset = read_journal(offset)
+        for event in events:
             if (event_types is None or event["type"] in event_types) and \
                (correlation_id is None or event["correlation_id"] == correlation_id):
                 callback(event)
-            seen.add(file)
+
+    drain()
+    if watch is not None:
+        def watch_filter(change, path: str) -> bool:
+            return os.path.basename(path) == EVENTS_LOG.name
+
+        for _ in watch(EVENTS_DIR, watch_filter=watch_filter, recursive=False):
+            drain()
+        return
+
+    while True:
         time.sleep(poll_interval)
+        drain()
+
+# Running listener threads keyed by (callback, event_types, correlation_id)
+_listeners: Dict[tuple, threading.Thread] = {}
+_listeners_lock = threading.Lock()
 
 def start_listener_in_thread(callback, event_types=None, correlation_id=None, poll_interval=1.0):
-    t = threading.Thread(
-        target=listen_events, 
-        args=(callback, event_types, correlation_id, poll_interval),
-        daemon=True
-    )
-    t.start()
+    """
+    Start listen_events() on a daemon thread. Idempotent: a repeated call for the same
+    callback and filters returns the thread that is already running.
+    """
+    key = (callback, tuple(event_types) if event_types is not None else None, correlation_id)
+    with _listeners_lock:
+        t = _listeners.get(key)
+        if t is not None and t.is_alive():
+            return t
+        t = threading.Thread(
+            target=listen_events, 
+            args=(callback, event_types, correlation_id, poll_interval),
+            daemon=True
+        )
+        t.start()
+        _listeners[key] = t
     return t
 
 # --- USAGE EXAMPLES ---
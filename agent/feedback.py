@@ -1,11 +1,13 @@
 import datetime
-import json
 import logging
 import os
-import shutil
+import random
+import time
 from pathlib import Path
 from typing import Optional, List, Dict, Any
 from agent.event_bus import publish_event
+from agent.utils import append_jsonl, get_openai_client, iter_jsonl, loads_json, tail_jsonl
+from agent import cas_backup
 
 try:
     from termcolor import cprint
@@ -20,9 +22,16 @@ except ImportError:
 from agent.event_bus import publish_request, publish_response, start_listener_in_thread
 
 # Configuration
-FEEDBACK_LOG = "logs/feedback_activity.json"
+FEEDBACK_LOG = "logs/feedback_activity.jsonl"
 BACKUP_ROOT = "logs/agent_backups/feedback"
-RETRIES = 3
+RETRIES = 5
+LLM_TIMEOUT = 120  # seconds per summary request
+FEEDBACK_STORE = "feedback.jsonl"  # per-app, append-only
+LEGACY_FEEDBACK_STORE = "feedback.json"  # per-app JSON array, read-only
+FEEDBACK_WINDOW = 200  # most recent entries fed to the summary prompt
+
+# Rate-limit/timeout/connection errors worth retrying.
+_RETRYABLE_ERRORS = (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError) if openai else ()
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -43,19 +52,17 @@ class Feedback:
 
     def _log_action(self, action: str, details: Dict[str, Any] = None):
         os.makedirs(os.path.dirname(FEEDBACK_LOG), exist_ok=True)
-        if os.path.exists(FEEDBACK_LOG):
-            with open(FEEDBACK_LOG, encoding="utf-8") as f:
-                all_logs = json.load(f)
-        else:
-            all_logs = []
         entry = {
             "timestamp": datetime.datetime.now().isoformat(),
             "action": action,
             "details": details or {}
         }
-        all_logs.append(entry)
-        with open(FEEDBACK_LOG, "w", encoding="utf-8") as f:
-            json.dump(all_logs, f, indent=2)
+        append_jsonl(FEEDBACK_LOG, entry)
+
+    @staticmethod
+    def read_logs():
+        """Yield logged feedback actions, oldest first."""
+        return iter_jsonl(FEEDBACK_LOG)
 
     def backup_file(self, file_path: str) -> None:
         """Backup a file before modification to backup directory (not inline)."""
@@ -64,56 +71,63 @@ class Feedback:
             backup_dir = Path(BACKUP_ROOT)
             backup_dir.mkdir(parents=True, exist_ok=True)
             bak = backup_dir / f"{file_path.stem}.bak_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}{file_path.suffix}"
-            shutil.copyfile(file_path, bak)
+            cas_backup.backup(file_path, bak)
             logging.info(f"Backup created: {bak}")
 
+    def load_feedback(self, app_name: str, limit: int = FEEDBACK_WINDOW) -> List[Dict[str, Any]]:
+        """
+        Return the last `limit` feedback entries for an app, oldest first.
+        Entries from a legacy feedback.json are read ahead of the JSONL store.
+        """
+        app_dir = self.apps_base_dir / app_name
+        entries = tail_jsonl(str(app_dir / FEEDBACK_STORE), limit)
+        if len(entries) < limit:
+            try:
+                with open(app_dir / LEGACY_FEEDBACK_STORE, "rb") as f:
+                    legacy = loads_json(f.read() or b"[]")
+            except FileNotFoundError:
+                legacy = []
+            entries = legacy[len(entries) - limit:] + entries
+        return entries
+
     def collect_feedback(self, app_name: str) -> None:
         """
-        Prompt user for feedback and save it to app's feedback.json.
+        Prompt user for feedback and append it to app's feedback.jsonl.
         """
         feedback = input(f"Enter feedback for {app_name}: ").strip()
         if not feedback:
             cprint("No feedback provided.", "yellow")
             return
 
-        fb_path = self.apps_base_dir / app_name / "feedback.json"
-        self.backup_file(fb_path)
+        fb_path = self.apps_base_dir / app_name / FEEDBACK_STORE
         now = datetime.datetime.now().isoformat()
         feedback_entry = {
             "timestamp": now,
             "feedback": feedback
         }
         try:
-            if fb_path.exists():
-                with open(fb_path, encoding="utf-8") as f:
-                    fb_log = json.load(f)
-            else:
-                fb_log = []
-            fb_log.append(feedback_entry)
-            with open(fb_path, "w", encoding="utf-8") as f:
-                json.dump(fb_log, f, indent=2)
+            fb_path.parent.mkdir(parents=True, exist_ok=True)
+            append_jsonl(str(fb_path), feedback_entry)
             cprint("Feedback saved!", "green")
             self._log_action("collect_feedback", {"app": app_name, "feedback": feedback})
         except Exception as e:
-            publish_event('error', {'agent': 'feedback', 'error': str(e), 'timestamp': datetime.datetime.now().isoformat()})  # [event_bus hook]
+            publish_event('error', {'agent': 'feedback', 'error': str(e), 'timestamp': now})  # [event_bus hook]
             cprint(f"[FAIL] Error saving feedback: {e}", "red")
 
     def run_loop(self, app_name: str) -> None:
         """
         Feedback improvement loop: analyze, summarize, and suggest actions.
         """
-        fb_path = self.apps_base_dir / app_name / "feedback.json"
-        if not fb_path.exists():
-            cprint(f"No feedback found for {app_name}.", "yellow")
-            return
-
+        now_iso = datetime.datetime.now().isoformat()  # event envelopes keep the exact time.time()
         try:
-            with open(fb_path, encoding="utf-8") as f:
-                fb_log = json.load(f)
+            fb_log = self.load_feedback(app_name)
         except Exception as e:
-            publish_event('error', {'agent': 'feedback', 'error': str(e), 'timestamp': datetime.datetime.now().isoformat()})  # [event_bus hook]
+            publish_event('error', {'agent': 'feedback', 'error': str(e), 'timestamp': now_iso})  # [event_bus hook]
             cprint(f"[FAIL] Error reading feedback: {e}", "red")
             return
+        if not fb_log:
+            cprint(f"No feedback found for {app_name}.", "yellow")
+            return
 
         all_feedback = "\n".join(fb["feedback"] for fb in fb_log)
         prompt = (
@@ -122,20 +136,31 @@ class Feedback:
         )
 
         summary = ""
-        if openai and os.environ.get("OPENAI_API_KEY"):
+        client = get_openai_client()
+        if client:
             for attempt in range(1, RETRIES+1):
                 try:
-                    resp = openai.ChatCompletion.create(
+                    resp = client.chat.completions.create(
                         model="gpt-4o",
                         messages=[{"role": "system", "content": prompt}],
                         max_tokens=600,
                         temperature=0.15,
+                        timeout=LLM_TIMEOUT,
                     )
                     summary = resp.choices[0].message.content
                     break
-                except Exception as e:
-                    publish_event('error', {'agent': 'feedback', 'error': str(e), 'timestamp': datetime.datetime.now().isoformat()})  # [event_bus hook]
+                except _RETRYABLE_ERRORS as e:
+                    publish_event('error', {'agent': 'feedback', 'error': str(e), 'timestamp': now_iso})  # [event_bus hook]
                     cprint(f"[WARN] LLM error on attempt {attempt}: {e}", "yellow")
+                    if attempt < RETRIES:
+                        time.sleep(random.uniform(2, 4) * attempt)  # jittered, growing backoff
+                except Exception as e:
+                    # Auth/bad-request errors will not succeed on retry
+                    publish_event('error', {'agent': 'feedback', 'error': str(e), 'timestamp': now_iso})  # [event_bus hook]
+                    cprint(f"[WARN] LLM error (not retryable): {e}", "yellow")
+                    break
+            else:
+                publish_event('llm_retry_exhausted', {'agent': 'feedback', 'app': app_name, 'attempts': RETRIES, 'timestamp': now_iso})
         else:
             summary = "[WARN] LLM not configured. Cannot summarize feedback."
 
@@ -182,4 +207,9 @@ def handle_feedback_request(event):
     result = {"status": "handled", "details": f"feedback_request handled by agent."}
     publish_response("feedback_result", result, correlation_id=event.get("correlation_id"))
 
-start_listener_in_thread(handle_feedback_request, event_types=["feedback_request"])
+def register_event_handlers():
+    """Start the Feedback agent's event-bus listener (a no-op if already running)."""
+    start_listener_in_thread(handle_feedback_request, event_types=["feedback_request"])
+
+if os.environ.get("AGENT_LISTEN") == "1":
+    register_event_handlers()
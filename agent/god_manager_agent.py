@@ -1,27 +1,50 @@
 # agent/god_manager_agent.py
 
 import importlib
+import importlib.util
 import os
+import sys
 import traceback
 from termcolor import cprint, colored
 
-AGENT_MODULES = [
+AGENT_MODULES = (
     "planner", "coder", "tester", "deployer", "auto_upgrade_agent", "devops_fixer",
     "incident_responder", "supreme_auditor", "peer_review_agent", "knowledgebase_agent",
     "metrics_collector", "rollback", "root_cause_analytics", "llm_codegen", "llm_router",
     "llm_selector_dashboard", "plugin_loader", "plugin_hot_reload_daemon", "project_wizard_agent",
     "onboarding_agent", "super_devops_agent", "deploy_tools", "event_bus", "context_loader", "feedback"
-]
+)
+_AGENTS_CACHE = {}  # base_path -> loaded modules; imports happen once per process
+
+def _safe_import(base_path, mod_name):
+    """
+    Return a lazily-executed module: its code runs on first attribute access, so agents a
+    session never uses cost only a spec lookup. Import-time side effects (e.g. event-bus
+    listeners) are deferred too; modules needing them expose register_event_handlers().
+    """
+    full_name = f"{base_path}.{mod_name}"
+    if full_name in sys.modules:
+        return sys.modules[full_name]
+    try:
+        spec = importlib.util.find_spec(full_name)
+        if spec is None or spec.loader is None:
+            cprint(f"[Warning] Could not load agent: {mod_name} - module not found", "yellow")
+            return None
+        loader = importlib.util.LazyLoader(spec.loader)
+        spec.loader = loader
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[full_name] = module
+        loader.exec_module(module)
+        return module
+    except Exception as e:
+        cprint(f"[Warning] Could not load agent: {mod_name} - {e}", "yellow")
+        return None
 
 def load_agent_modules(base_path="agent"):
-    agents = {}
-    for mod_name in AGENT_MODULES:
-        try:
-            mod = importlib.import_module(f"{base_path}.{mod_name}")
-            agents[mod_name] = mod
-        except Exception as e:
-            cprint(f"[Warning] Could not load agent: {mod_name} - {e}", "yellow")
-    return agents
+    if base_path not in _AGENTS_CACHE:
+        results = ((name, _safe_import(base_path, name)) for name in AGENT_MODULES)
+        _AGENTS_CACHE[base_path] = {name: mod for name, mod in results if mod is not None}
+    return dict(_AGENTS_CACHE[base_path])
 
 class GodManagerAgent:
     def __init__(self):
@@ -43,6 +66,20 @@ class GodManagerAgent:
             "rollback": ["rollback"],
             "project_wizard": ["project_wizard_agent"],
         }
+        self._entrypoints = {}  # agent name -> resolved entry point, filled on first use
+
+    def _entrypoint(self, name):
+        """Resolve an agent's entry point once: prefer main_entry, fallback to main()."""
+        if name not in self._entrypoints:
+            mod = self.agents[name]
+            try:
+                # First attribute access executes a lazily-loaded module
+                entry = getattr(mod, "main_entry", None) or getattr(mod, "main", None) or getattr(mod, name, None)
+            except Exception:
+                sys.modules.pop(mod.__name__, None)
+                raise
+            self._entrypoints[name] = entry
+        return self._entrypoints[name]
     
     def run_workflow(self, workflow, *args, **kwargs):
         steps = self.workflows.get(workflow)
@@ -55,15 +92,11 @@ class GodManagerAgent:
             if agent:
                 try:
                     cprint(f"→ Calling agent: {agent_name}", "yellow")
-                    # Prefer main_entry, fallback to main()
-                    if hasattr(agent, "main_entry"):
-                        agent.main_entry(*args, **kwargs)
-                    elif hasattr(agent, "main"):
-                        agent.main(*args, **kwargs)
-                    elif hasattr(agent, agent_name):
-                        getattr(agent, agent_name)(*args, **kwargs)
-                    else:
+                    entry = self._entrypoint(agent_name)
+                    if entry is None:
                         cprint(f"[Skip] No main entry found for {agent_name}.", "magenta")
+                        continue
+                    entry(*args, **kwargs)
                 except Exception as e:
                     cprint(f"[FAIL] {agent_name} failed: {e}", "red")
                     traceback.print_exc()
@@ -78,14 +111,11 @@ class GodManagerAgent:
             return
         cprint(f"\n⚡ Running agent: {agent_name}", "cyan")
         try:
-            if hasattr(agent, "main_entry"):
-                return agent.main_entry(*args, **kwargs)
-            elif hasattr(agent, "main"):
-                return agent.main(*args, **kwargs)
-            elif hasattr(agent, agent_name):
-                return getattr(agent, agent_name)(*args, **kwargs)
-            else:
+            entry = self._entrypoint(agent_name)
+            if entry is None:
                 cprint(f"[Skip] No main entry found for {agent_name}.", "magenta")
+                return
+            return entry(*args, **kwargs)
         except Exception as e:
             cprint(f"[FAIL] {agent_name} failed: {e}", "red")
             traceback.print_exc()
@@ -1,12 +1,15 @@
+import csv
 import datetime
 import logging
 import traceback
 import os
-import shutil
-import json
+import re
+from concurrent.futures import ThreadPoolExecutor, wait
 from pathlib import Path
 from typing import Any, List, Optional
 from agent.event_bus import publish_event
+from agent.utils import append_jsonl, atomic_write_bytes, iter_jsonl
+from agent import cas_backup
 
 try:
     from termcolor import cprint
@@ -20,20 +23,131 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 HEALTH_LOG_ROOT = Path("logs/health_checks")
-CENTRAL_HEALTH_LOG = Path("logs/system_health_summary.json")
+CENTRAL_HEALTH_LOG = Path("logs/system_health_detail.jsonl")
+HEALTH_SUMMARY_TSV = Path("logs/system_health_summary.tsv")
+HEALTH_SUMMARY_COLUMNS = ("ts", "status", "n_errors", "n_apps", "n_failing")
 HEALTH_LOG_ROOT.mkdir(parents=True, exist_ok=True)
+_BACKUP_POOL = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 4))
+LOG_SCAN_TAIL_BYTES = 256 * 1024
+_LOG_ERROR_RE = re.compile(rb"FAIL|Error|Traceback")
+BATCH_ERRORS = True  # one error_batch event per app instead of one error event per failure
+
+def _publish_error(payload: dict) -> None:
+    publish_event('error', payload)
+
+def _flush_errors(errors_buf: List[dict], app_name: str) -> None:
+    """Publish one app's buffered errors as a single error_batch event."""
+    if errors_buf:
+        publish_event('error_batch', {'agent': 'health', 'app': app_name, 'errors': errors_buf})
 
 def log_health_result(data: dict):
-    # Append a summary JSON record for dashboard/Notion sync
+    # Append one fixed-column summary row (cheap to scan) and the full record (one JSON per line)
     CENTRAL_HEALTH_LOG.parent.mkdir(exist_ok=True, parents=True)
-    if CENTRAL_HEALTH_LOG.exists():
-        with CENTRAL_HEALTH_LOG.open(encoding="utf-8") as f:
-            all_logs = json.load(f)
-    else:
-        all_logs = []
-    all_logs.append(data)
-    with CENTRAL_HEALTH_LOG.open("w", encoding="utf-8") as f:
-        json.dump(all_logs, f, indent=2)
+    apps = data.get("apps", [])
+    row = (
+        data.get("timestamp", ""),
+        data.get("status", ""),
+        len(data.get("errors", [])),
+        len(apps),
+        sum(1 for app in apps if app.get("failures")),
+    )
+    with HEALTH_SUMMARY_TSV.open("a", encoding="utf-8", newline="") as f:
+        if f.tell() == 0:
+            f.write("\t".join(HEALTH_SUMMARY_COLUMNS) + "\n")
+        f.write("\t".join(map(str, row)) + "\n")
+    append_jsonl(str(CENTRAL_HEALTH_LOG), data)
+
+def read_health_results():
+    """Yield recorded full health records, oldest first."""
+    return iter_jsonl(str(CENTRAL_HEALTH_LOG))
+
+def read_health_summary() -> List[dict]:
+    """Return the summary rows (ts, status, n_errors, n_apps, n_failing), oldest first."""
+    try:
+        f = HEALTH_SUMMARY_TSV.open(encoding="utf-8", newline="")
+    except FileNotFoundError:
+        return []
+    with f:
+        rows = list(csv.DictReader(f, delimiter="\t"))
+    for row in rows:
+        for col in HEALTH_SUMMARY_COLUMNS[2:]:
+            row[col] = int(row[col])
+    return rows
+
+def _check_one_app(app: Path, timestamp: str, auto_heal: bool, log, tests):
+    """Back up, upgrade, test and (optionally) heal one app. Returns (app_report, ok)."""
+    from agent.coder import Coder
+    from agent.planner import Planner
+    from agent.super_devops_agent import main_entry as super_devops_main
+    ok = True
+    app_report = {"app": app.name, "pre_test_passed": None, "healed": False, "heal_attempts": 0, "failures": []}
+    errors_buf: List[dict] = []
+    now_iso = datetime.datetime.now().isoformat()  # shared by this app's error payloads
+    report_error = errors_buf.append if BATCH_ERRORS else _publish_error
+    try:
+        log(f"\n[CHECK] Diagnosing and testing app: {app.name}", "magenta")
+        Planner().list_apps()
+        # Backup before upgrades!
+        try:
+            backup_dir = Path("logs/agent_backups") / app.name
+            backup_dir.mkdir(exist_ok=True, parents=True)
+            # Submit every backup at once; unchanged files only add a link to the shared blob
+            futures = [
+                _BACKUP_POOL.submit(cas_backup.backup, file, backup_dir / f"{file.name}.bak_{timestamp}")
+                for file in app.glob("*.py")
+            ]
+            wait(futures)
+            failed = [fut.exception() for fut in futures if fut.exception() is not None]
+            if failed:
+                raise RuntimeError(f"{len(failed)} of {len(futures)} file backups failed: {failed[0]}")
+        except Exception as e:
+            report_error({'agent': 'health', 'error': str(e), 'timestamp': now_iso})
+            log(f"[WARN] Backup error for {app.name}: {e}", "yellow")
+        # Upgrade & Test
+        try:
+            Coder.upgrade_app(app.name)
+            test_passed = tests.run_tests(app.name)
+            app_report["pre_test_passed"] = bool(test_passed)
+            if test_passed:
+                log(f"[OK] Tests passed for {app.name}.", "green")
+            else:
+                ok = False
+                log(f"[FAIL] Tests FAILED for {app.name}.", "red")
+                app_report["failures"].append("Initial tests failed.")
+                # Auto-heal loop (up to 3 attempts, full rollback if all fail)
+                if auto_heal:
+                    for attempt in range(1, 4):
+                        log(f"[ACTION] Healing with Super DevOps Agent (attempt {attempt})...", "cyan")
+                        try:
+                            super_devops_main(app.name)
+                            healed = tests.run_tests(app.name)
+                            app_report["heal_attempts"] += 1
+                            if healed:
+                                log(f"[OK] Healed: Tests now pass for {app.name}.", "green")
+                                app_report["healed"] = True
+                                break
+                            else:
+                                log(f"[FAIL] Still failing after healing for {app.name}.", "red")
+                                app_report["failures"].append(f"Heal attempt {attempt} failed.")
+                        except Exception as e:
+                            report_error({'agent': 'health', 'error': str(e), 'timestamp': now_iso})
+                            log(f"[FAIL] Healing attempt failed: {e}", "red")
+                            log(traceback.format_exc(), "red")
+                            app_report["failures"].append(f"Heal exception {attempt}: {str(e)}")
+        except Exception as e:
+            report_error({'agent': 'health', 'error': str(e), 'timestamp': now_iso})
+            log(f"[FAIL] Agent action failed for {app.name}: {e}", "red")
+            log(traceback.format_exc(), "red")
+            app_report["failures"].append(str(e))
+            ok = False
+    except Exception as e:
+        report_error({'agent': 'health', 'error': str(e), 'timestamp': now_iso})
+        log(f"[FAIL] Outer error for {app.name}: {e}", "red")
+        log(traceback.format_exc(), "red")
+        app_report["failures"].append(str(e))
+        ok = False
+    _flush_errors(errors_buf, app.name)
+    return app_report, ok
 
 def health_check(
     verbose: bool = True,
@@ -68,10 +182,11 @@ def health_check(
 
     # 1. Core agent import check
     try:
-        from agent.coder import Coder
-        from agent.planner import Planner
-        from agent.super_devops_agent import main_entry as super_devops_main
-        from agent.tester import Tester
+        from agent.coder import Coder  # noqa: F401
+        from agent.planner import Planner  # noqa: F401
+        from agent.super_devops_agent import main_entry as super_devops_main  # noqa: F401
+        from agent.tester import Tester  # noqa: F401
+        from agent.testrun_cache import TestRunCache
         log("[OK] All core agents imported.", "green")
     except ImportError as e:
         log(f"[FAIL] Import error: {e}", "red")
@@ -91,67 +206,13 @@ def health_check(
     else:
         log("[WARN] No apps found. Please create one before running full health checks.", "yellow")
 
-    # 3. Per-app health checks
+    # 3. Per-app health checks (one at a time: Coder.upgrade_app prompts via input())
     all_ok = True
+    tests = TestRunCache()
     for app in apps:
-        app_report = {"app": app.name, "pre_test_passed": None, "healed": False, "heal_attempts": 0, "failures": []}
-        try:
-            log(f"\n[CHECK] Diagnosing and testing app: {app.name}", "magenta")
-            Planner().list_apps()
-            # Backup before upgrades!
-            try:
-                for file in app.glob("*.py"):
-                    backup_dir = Path("logs/agent_backups") / app.name
-                    backup_dir.mkdir(exist_ok=True, parents=True)
-                    bak = backup_dir / f"{file.name}.bak_{timestamp}"
-                    shutil.copyfile(file, bak)
-            except Exception as e:
-                publish_event('error', {'agent': 'health', 'error': str(e), 'timestamp': datetime.datetime.now().isoformat()})
-                log(f"[WARN] Backup error for {app.name}: {e}", "yellow")
-            # Upgrade & Test
-            try:
-                Coder.upgrade_app(app.name)
-                test_passed = Tester.run_tests(app.name)
-                app_report["pre_test_passed"] = bool(test_passed)
-                if test_passed:
-                    log(f"[OK] Tests passed for {app.name}.", "green")
-                else:
-                    all_ok = False
-                    log(f"[FAIL] Tests FAILED for {app.name}.", "red")
-                    app_report["failures"].append("Initial tests failed.")
-                    # Auto-heal loop (up to 3 attempts, full rollback if all fail)
-                    if auto_heal:
-                        for attempt in range(1, 4):
-                            log(f"[ACTION] Healing with Super DevOps Agent (attempt {attempt})...", "cyan")
-                            try:
-                                super_devops_main(app.name)
-                                healed = Tester.run_tests(app.name)
-                                app_report["heal_attempts"] += 1
-                                if healed:
-                                    log(f"[OK] Healed: Tests now pass for {app.name}.", "green")
-                                    app_report["healed"] = True
-                                    break
-                                else:
-                                    log(f"[FAIL] Still failing after healing for {app.name}.", "red")
-                                    app_report["failures"].append(f"Heal attempt {attempt} failed.")
-                            except Exception as e:
-                                publish_event('error', {'agent': 'health', 'error': str(e), 'timestamp': datetime.datetime.now().isoformat()})
-                                log(f"[FAIL] Healing attempt failed: {e}", "red")
-                                log(traceback.format_exc(), "red")
-                                app_report["failures"].append(f"Heal exception {attempt}: {str(e)}")
-            except Exception as e:
-                publish_event('error', {'agent': 'health', 'error': str(e), 'timestamp': datetime.datetime.now().isoformat()})
-                log(f"[FAIL] Agent action failed for {app.name}: {e}", "red")
-                log(traceback.format_exc(), "red")
-                app_report["failures"].append(str(e))
-                all_ok = False
-        except Exception as e:
-            publish_event('error', {'agent': 'health', 'error': str(e), 'timestamp': datetime.datetime.now().isoformat()})
-            log(f"[FAIL] Outer error for {app.name}: {e}", "red")
-            log(traceback.format_exc(), "red")
-            app_report["failures"].append(str(e))
-            all_ok = False
+        app_report, ok = _check_one_app(app, timestamp, auto_heal, log, tests)
         dashboard["apps"].append(app_report)
+        all_ok = all_ok and ok
 
     # 4. Scan logs for recent errors
     log_dir = Path(__file__).resolve().parent.parent / "logs"
@@ -160,9 +221,11 @@ def health_check(
         if logs:
             log(f"[INFO] Found {len(logs)} log files, scanning last 2...", "cyan")
             for lf in logs[-2:]:
-                with lf.open(encoding="utf-8") as f:
+                # Recent errors live at the end: scan only the tail window, not the whole file
+                with lf.open("rb") as f:
+                    f.seek(max(0, lf.stat().st_size - LOG_SCAN_TAIL_BYTES))
                     content = f.read()
-                if "FAIL" in content or "Error" in content or "Traceback" in content:
+                if _LOG_ERROR_RE.search(content):
                     log(f"[WARN] Errors found in log {lf.name}", "yellow")
                     dashboard["errors"].append(f"Errors in {lf.name}")
         else:
@@ -184,7 +247,7 @@ def doctor(app: Optional[str] = None, fix_all: bool = False) -> None:
     cprint("\n=== SUPER AGENT SYSTEM DOCTOR ===", "magenta")
     try:
         from agent.super_devops_agent import main_entry as super_devops_main
-        from agent.tester import Tester
+        from agent.testrun_cache import TestRunCache
     except ImportError as e:
         cprint(f"[FAIL] Import error: {e}", "red")
         return
@@ -206,16 +269,20 @@ def doctor(app: Optional[str] = None, fix_all: bool = False) -> None:
             cprint("No app selected for diagnosis.", "red")
             return
 
+    tests = TestRunCache()
     for app in apps:
         cprint(f"\n[Doctor] Running full test suite for {app.name}...", "cyan")
+        errors_buf: List[dict] = []
+        now_iso = datetime.datetime.now().isoformat()
+        report_error = errors_buf.append if BATCH_ERRORS else _publish_error
         try:
-            passed = Tester.run_tests(app.name)
+            passed = tests.run_tests(app.name)
             if not passed:
                 cprint(f"[FAIL] Tests failed for {app.name}. Auto-fixing...", "yellow")
                 for attempt in range(1, 4):
                     try:
                         super_devops_main(app.name)
-                        passed2 = Tester.run_tests(app.name)
+                        passed2 = tests.run_tests(app.name)
                         if passed2:
                             cprint(f"[OK] Healed: Tests now pass for {app.name}.", "green")
                             break
@@ -225,7 +292,7 @@ def doctor(app: Optional[str] = None, fix_all: bool = False) -> None:
                                 "red",
                             )
                     except Exception as e:
-                        publish_event('error', {'agent': 'health', 'error': str(e), 'timestamp': datetime.datetime.now().isoformat()})
+                        report_error({'agent': 'health', 'error': str(e), 'timestamp': now_iso})
                         cprint(
                             f"[FAIL] Healing attempt failed for {app.name}: {e}\n{traceback.format_exc()}",
                             "red",
@@ -233,13 +300,13 @@ def doctor(app: Optional[str] = None, fix_all: bool = False) -> None:
             else:
                 cprint(f"[OK] All tests pass for {app.name}.", "green")
         except Exception as e:
-            publish_event('error', {'agent': 'health', 'error': str(e), 'timestamp': datetime.datetime.now().isoformat()})
+            report_error({'agent': 'health', 'error': str(e), 'timestamp': now_iso})
             cprint(
                 f"[FAIL] Doctor encountered error in {app.name}: {e}\n{traceback.format_exc()}",
                 "red",
             )
+        _flush_errors(errors_buf, app.name)
 
 def _save_log(lines: List[str], health_log_path: Path) -> None:
     health_log_path.parent.mkdir(parents=True, exist_ok=True)
-    with health_log_path.open("w", encoding="utf-8") as f:
-        f.write("\n".join(lines) + "\n")
+    atomic_write_bytes(str(health_log_path), ("\n".join(lines) + "\n").encode("utf-8"))
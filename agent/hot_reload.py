@@ -4,11 +4,27 @@ import threading
 import time
 import os
 from pathlib import Path
-from agent.plugin_hot_reload_daemon import start_plugin_hot_reload_daemon
+from agent.plugin_hot_reload_daemon import PluginHotReloader
 from agent.event_bus import publish_event
+from agent.utils import atomic_write_bytes, dumps_json_bytes
 
 PLUGIN_DIR = Path("plugins")
 STATUS_FILE = Path("logs/hot_reload_status.json")
+READY_TIMEOUT = 5.0  # seconds to wait for the daemon's first plugin scan
+
+_status_lock = threading.Lock()
+_last_status = None
+
+def _write_status(status: dict) -> None:
+    """Atomically write the status file for observers, skipping unchanged content."""
+    global _last_status
+    data = dumps_json_bytes(status)
+    with _status_lock:
+        if data == _last_status:
+            return
+        STATUS_FILE.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write_bytes(str(STATUS_FILE), data)
+        _last_status = data
 
 def main_entry():
     """
@@ -27,29 +43,35 @@ def main_entry():
         PLUGIN_DIR.mkdir(parents=True, exist_ok=True)
         print(f"ℹ️  Drop your plugin .py files into '{PLUGIN_DIR}/' and rerun this menu option.")
 
+    ready = threading.Event()
+    crashed = []
+
     def daemon_runner():
         try:
             print("🔄 [HotReload] Starting plugin hot-reload daemon...")
             publish_event("hot_reload_started", {"timestamp": time.time()})
-            start_plugin_hot_reload_daemon()
+            # Run the reloader on this thread so a crash, even before the first scan, lands below
+            PluginHotReloader().run(on_ready=ready.set)
             publish_event("hot_reload_stopped", {"timestamp": time.time()})
         except Exception as e:
             msg = f"🔥 [HotReload] Daemon crashed: {e}"
             print(msg)
             publish_event("hot_reload_failed", {"error": str(e), "timestamp": time.time()})
-            # Optionally: write error to status file
-            with open(STATUS_FILE, "w", encoding="utf-8") as f:
-                f.write(f'{{"status": "error", "error": "{str(e)}"}}')
+            _write_status({"status": "error", "error": str(e)})
+            crashed.append(e)
+            ready.set()
 
     thread = threading.Thread(target=daemon_runner, daemon=True)
     thread.start()
-    time.sleep(0.7)  # Let daemon initialize
+    if not ready.wait(timeout=READY_TIMEOUT):
+        publish_event("hot_reload_slow_start", {"timeout": READY_TIMEOUT, "timestamp": time.time()})
+    if crashed:
+        return
     print("✅ [HotReload] Daemon started. Watching 'plugins/' for live changes…")
     publish_event("hot_reload_status", {"status": "running", "timestamp": time.time()})
     setattr(main_entry, "_daemon_started", True)
     # Optionally, write a status file for diagnostics
-    with open(STATUS_FILE, "w", encoding="utf-8") as f:
-        f.write('{"status": "running"}')
+    _write_status({"status": "running"})
 
 if __name__ == "__main__":
     main_entry()
@@ -5,13 +5,17 @@ import time
 import json
 import datetime
 import logging
+import threading
+from collections import defaultdict, deque
 from pathlib import Path
 from typing import Dict, Any, List, Optional
 from agent.event_bus import listen_events, publish_event
+from agent.utils import append_jsonl, atomic_write_bytes, dumps_json_bytes, iter_jsonl, loads_json
 
 LOGS_DIR = Path("logs/incident_responder")
 LOGS_DIR.mkdir(parents=True, exist_ok=True)
-INCIDENT_SUMMARIES = LOGS_DIR / "incident_summaries.json"
+INCIDENT_SUMMARIES = LOGS_DIR / "incident_summaries.jsonl"
+LEGACY_INCIDENT_SUMMARIES = LOGS_DIR / "incident_summaries.json"  # JSON array, read-only
 METRICS_FILE = LOGS_DIR / "metrics.json"
 LAST_NOTIFY_FILE = LOGS_DIR / "last_notify.json"
 
@@ -25,13 +29,28 @@ SUCCESS_EVENTS = {"upgrade_applied", "test_passed", "heal_succeeded"}
 WINDOW = 1800  # 30 min incident window, can be per-agent in future
 RETRY_LIMIT = 3  # Escalate if more than N failures per agent
 NOTIFY_COOLDOWN = 600  # 10 min cooldown per agent for escalations
+METRICS_FLUSH_INTERVAL = 2.0  # at most one metrics.json write per interval
+
+def iter_incidents():
+    """Yield logged incidents, oldest first: a legacy incident_summaries.json array, then the JSONL log."""
+    try:
+        with open(LEGACY_INCIDENT_SUMMARIES, "rb") as f:
+            yield from loads_json(f.read() or b"[]")
+    except FileNotFoundError:
+        pass
+    yield from iter_jsonl(str(INCIDENT_SUMMARIES))
 
 class IncidentResponderAgent:
     def __init__(self):
-        self.recent_events: List[Any] = []
-        self.agent_fail_counts: Dict[str, int] = {}
+        self.recent_events: deque = deque()  # (event_type, agent, ts, event), oldest first
+        self.agent_failures: Dict[str, deque] = defaultdict(deque)  # agent -> (ts, event) failures in window
         self.incidents: List[Any] = []
         self.last_notified: Dict[str, float] = self.load_last_notify()
+        self._metrics_dirty = False
+        self._last_metrics_flush = 0.0
+        self._last_metrics_bytes: Optional[bytes] = None
+        self._metrics_lock = threading.Lock()  # shared with the trailing-flush timer thread
+        self._flush_timer: Optional[threading.Timer] = None
 
     def on_event(self, event: Dict[str, Any]):
         event_type = event.get("event_type")
@@ -39,17 +58,25 @@ class IncidentResponderAgent:
         timestamp = event.get("timestamp", time.time())
         parent = event.get("parent_event")
         context = event.get("context") or {}
+        last_incident = self.incidents[-1] if self.incidents else None
 
-        # Maintain rolling window of recent events
-        self.recent_events.append((event_type, agent, timestamp, event))
+        # Maintain rolling window of recent events: evict expired entries from the head
         now = time.time()
-        self.recent_events = [(t, a, ts, ev) for t, a, ts, ev in self.recent_events if now - ts < WINDOW]
+        recent = self.recent_events
+        while recent and now - recent[0][2] >= WINDOW:
+            t, a, ts, ev = recent.popleft()
+            failures = self.agent_failures.get(a)
+            if failures and failures[0][1] is ev:
+                failures.popleft()
+        in_window = now - timestamp < WINDOW
+        if in_window:
+            recent.append((event_type, agent, timestamp, event))
 
         # Detect failures
-        if event_type in FAILURE_EVENTS and agent:
-            prev_count = self.agent_fail_counts.get(agent, 0)
-            count = prev_count + 1
-            self.agent_fail_counts[agent] = count
+        if event_type in FAILURE_EVENTS and agent and in_window:
+            failures = self.agent_failures[agent]
+            failures.append((timestamp, event))
+            count = len(failures)
 
             if count >= RETRY_LIMIT:
                 # Incident escalation with cooldown
@@ -60,7 +87,7 @@ class IncidentResponderAgent:
                         "count": count,
                         "window": WINDOW,
                         "first_failure_time": self.find_first_failure_time(agent),
-                        "events": [ev for t, a, ts, ev in self.recent_events if a == agent and t in FAILURE_EVENTS],
+                        "events": [ev for _, ev in failures],
                         "parent": parent,
                         "context": context,
                         "detected_at": datetime.datetime.utcfromtimestamp(now).isoformat() + "Z",
@@ -72,7 +99,7 @@ class IncidentResponderAgent:
                     self.log_incident(incident)
                     self.last_notified[agent] = now
                     self.save_last_notify()
-                    self.agent_fail_counts[agent] = 0  # Reset
+                    failures.clear()  # Reset
                     logging.error(f"[INCIDENT] Agent {agent} had {count} failures in {WINDOW//60}min window! Incident escalated.")
                 else:
                     logging.info(f"[INCIDENT] Escalation for {agent} suppressed due to cooldown.")
@@ -80,17 +107,41 @@ class IncidentResponderAgent:
                 logging.warning(f"[Warning] {agent} failure count: {count}/{RETRY_LIMIT}")
                 publish_event("incident_warning", {"agent": agent, "fail_count": count})
         elif event_type in SUCCESS_EVENTS and agent:
-            self.agent_fail_counts[agent] = 0  # Reset on any success
-        self.write_metrics()
+            self.agent_failures.pop(agent, None)  # Reset on any success
+        # A new incident is flushed at once; routine count changes are coalesced
+        self._metrics_changed(now, force=bool(self.incidents) and self.incidents[-1] is not last_incident)
+
+    def _metrics_changed(self, now: float, force: bool = False):
+        """
+        Coalesce metrics writes: flush at most once per METRICS_FLUSH_INTERVAL. A change that
+        lands inside the interval is written by a timer once it has passed, even if no event follows.
+        """
+        with self._metrics_lock:
+            self._metrics_dirty = True
+            wait = METRICS_FLUSH_INTERVAL - (now - self._last_metrics_flush)
+            if force or wait <= 0:
+                self.write_metrics()
+                self._last_metrics_flush = now
+            elif self._flush_timer is None:
+                self._flush_timer = threading.Timer(wait, self._flush_pending_metrics)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def _flush_pending_metrics(self):
+        with self._metrics_lock:
+            self._flush_timer = None
+            if self._metrics_dirty:
+                self.write_metrics()
+                self._last_metrics_flush = time.time()
 
     def cooldown_active(self, agent: str, now: float) -> bool:
         last = self.last_notified.get(agent, 0)
         return (now - last) < NOTIFY_COOLDOWN
 
     def find_first_failure_time(self, agent: str) -> Optional[str]:
-        for t, a, ts, ev in self.recent_events:
-            if a == agent and t in FAILURE_EVENTS:
-                return datetime.datetime.utcfromtimestamp(ts).isoformat() + "Z"
+        failures = self.agent_failures.get(agent)
+        if failures:
+            return datetime.datetime.utcfromtimestamp(failures[0][0]).isoformat() + "Z"
         return None
 
     def root_cause_hint(self, agent: str) -> str:
@@ -109,13 +160,7 @@ class IncidentResponderAgent:
 
     def log_incident(self, incident: Dict[str, Any]):
         try:
-            data = []
-            if INCIDENT_SUMMARIES.exists():
-                with open(INCIDENT_SUMMARIES, encoding="utf-8") as f:
-                    data = json.load(f)
-            data.append(incident)
-            with open(INCIDENT_SUMMARIES, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=2)
+            append_jsonl(str(INCIDENT_SUMMARIES), incident)
         except Exception as e:
             logging.error(f"Failed to log incident: {e}")
 
@@ -123,11 +168,14 @@ class IncidentResponderAgent:
         metrics = {
             "total_incidents": len(self.incidents),
             "last_incident_time": self.incidents[-1]['detected_at'] if self.incidents else None,
-            "agent_failure_counts": dict(self.agent_fail_counts)
+            "agent_failure_counts": {agent: len(failures) for agent, failures in list(self.agent_failures.items())}
         }
         try:
-            with open(METRICS_FILE, "w", encoding="utf-8") as f:
-                json.dump(metrics, f, indent=2)
+            data = dumps_json_bytes(metrics, indent=True)
+            if data != self._last_metrics_bytes:  # unchanged metrics: skip the write
+                atomic_write_bytes(str(METRICS_FILE), data)
+                self._last_metrics_bytes = data
+            self._metrics_dirty = False
         except Exception as e:
             logging.error(f"Failed to write metrics: {e}")
 
@@ -149,12 +197,15 @@ class IncidentResponderAgent:
 
     def run(self):
         logging.info("[IncidentResponder] Listening for agent failures, rollbacks, and patterns...")
-        listen_events(
-            callback=self.on_event,
-            event_types=list(FAILURE_EVENTS | SUCCESS_EVENTS | ROLLBACK_EVENTS),
-            poll_interval=1.0
-        )
-        # This call blocks and will keep listening forever.
+        try:
+            listen_events(
+                callback=self.on_event,
+                event_types=list(FAILURE_EVENTS | SUCCESS_EVENTS | ROLLBACK_EVENTS),
+                poll_interval=1.0
+            )
+            # This call blocks and will keep listening forever.
+        finally:
+            self._flush_pending_metrics()
 
 def main_entry():
     """
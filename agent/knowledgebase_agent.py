@@ -2,9 +2,10 @@ import os
 import glob
 import json
 import datetime
-from collections import defaultdict
-from typing import List, Dict, Any, Optional
-from agent.event_bus import publish_event
+from collections import defaultdict, deque
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
+from agent.event_bus import legacy_event_files, publish_event, read_journal
 
 try:
     import openai
@@ -34,29 +35,73 @@ class SessionContext:
 
 session = SessionContext()
 
-def load_all_events(limit=2000):
-    event_files = sorted(glob.glob(os.path.join(EVENTS_DIR, "event_*.json")), reverse=True)
-    events = []
-    for fname in event_files[:limit]:
+# Parsed files keyed by path -> (mtime, data); only new or changed files are re-read
+_event_cache: Dict[str, Tuple[float, Any]] = {}
+_review_cache: Dict[str, Tuple[float, Any]] = {}
+# Journal tail read so far: byte offset plus the newest events (bounded)
+_journal_cache: Dict[str, Any] = {"offset": 0, "events": deque(maxlen=2000)}
+
+def _load_cached(paths: List[str], cache: Dict[str, Tuple[float, Any]]) -> List[Any]:
+    """Parse each JSON file once per mtime; forget files that have disappeared."""
+    loaded = []
+    for path in paths:
         try:
-            with open(fname, encoding="utf-8") as f:
-                e = json.load(f)
-            events.append(e)
-        except Exception:
+            mtime = os.stat(path).st_mtime
+        except OSError:
             continue
-    return events
+        hit = cache.get(path)
+        if hit is None or hit[0] != mtime:
+            try:
+                with open(path, encoding="utf-8") as f:
+                    hit = (mtime, json.load(f))
+            except Exception:
+                continue
+            cache[path] = hit
+        loaded.append(hit[1])
+    for path in cache.keys() - set(paths):
+        del cache[path]
+    return loaded
+
+def load_all_events(limit=2000):
+    # Newest first: legacy event files, then the journal, keeping only the last `limit` events
+    if limit > _journal_cache["events"].maxlen:
+        _journal_cache.update(offset=0, events=deque(maxlen=limit))
+    new_events, offset = read_journal(_journal_cache["offset"])
+    if offset < _journal_cache["offset"]:
+        _journal_cache["events"].clear()  # journal was truncated or replaced
+    _journal_cache["offset"] = offset
+    _journal_cache["events"].extend(new_events)
+    # Only the newest `limit` legacy files can survive the window, so older ones are never parsed
+    events = deque(_load_cached(legacy_event_files()[-limit:], _event_cache), maxlen=limit)
+    events.extend(_journal_cache["events"])
+    return list(reversed(events))
 
 def load_all_peer_reviews(limit=1000):
     review_files = sorted(glob.glob(os.path.join(PEER_REVIEWED_DIR, "review_*.json")), reverse=True)
-    reviews = []
-    for fname in review_files[:limit]:
-        try:
-            with open(fname, encoding="utf-8") as f:
-                r = json.load(f)
-            reviews.append(r)
-        except Exception:
-            continue
-    return reviews
+    return _load_cached(review_files[:limit], _review_cache)
+
+@lru_cache(maxsize=8192)
+def _parse_iso(s: str) -> float:
+    try:
+        return datetime.datetime.fromisoformat(s).timestamp()
+    except ValueError:
+        return 0
+
+def _to_ts(t) -> float:
+    """Epoch seconds from a numeric or ISO-string timestamp (0 if unknown)."""
+    if isinstance(t, (int, float)):
+        return t
+    if isinstance(t, str):
+        return _parse_iso(t)
+    return 0
+
+def _event_ts(e: Dict) -> float:
+    # Use system-wide event timestamp, falling back to review/legacy fields
+    return _to_ts(e.get("timestamp") or e.get("review_time") or e.get("time") or 0)
+
+@lru_cache(maxsize=8192)
+def _format_ts(t: int, fmt: str) -> str:
+    return datetime.datetime.fromtimestamp(t).strftime(fmt)
 
 def filter_events(events, agent: Optional[str]=None, event_type: Optional[str]=None, since: Optional[str]=None):
     filtered = []
@@ -70,17 +115,7 @@ def filter_events(events, agent: Optional[str]=None, event_type: Optional[str]=N
         et = e.get("event_type", e.get("type", "?"))
         ag = e.get("data", {}).get("agent", "unknown")
         # Use system-wide event timestamp
-        t = (
-            e.get("timestamp") or
-            e.get("review_time") or
-            e.get("time") or 0
-        )
-        # Parse timestamp if it's in string ISO format
-        if isinstance(t, str):
-            try:
-                t = datetime.datetime.fromisoformat(t).timestamp()
-            except Exception:
-                t = 0
+        t = _event_ts(e)
         if agent and agent.lower() not in ag.lower():
             continue
         if event_type and event_type.lower() != et.lower():
@@ -95,17 +130,8 @@ def summarize_events(events: List[Dict], maxlen=150):
     for e in events[:maxlen]:
         et = e.get("event_type", e.get("type", "?"))
         ag = e.get("data", {}).get("agent", "unknown")
-        t = (
-            e.get("timestamp") or
-            e.get("review_time") or
-            e.get("time") or 0
-        )
-        if isinstance(t, str):
-            try:
-                t = datetime.datetime.fromisoformat(t).timestamp()
-            except Exception:
-                t = 0
-        t_str = datetime.datetime.fromtimestamp(t).strftime("%Y-%m-%d %H:%M:%S") if t else "?"
+        t = _event_ts(e)
+        t_str = _format_ts(int(t), "%Y-%m-%d %H:%M:%S") if t else "?"
         outcome = e.get("data", {}).get("verdict", "") or e.get("data", {}).get("result", "")
         rows.append(f"{t_str} | {ag} | {et} | {outcome}")
     return "\n".join(rows)
@@ -115,23 +141,30 @@ def event_timeline(events: List[Dict], agent=None, event_type=None, maxlen=100):
     for e in events[:maxlen][::-1]:
         et = e.get("event_type", e.get("type", "?"))
         ag = e.get("data", {}).get("agent", "unknown")
-        t = (
-            e.get("timestamp") or
-            e.get("review_time") or
-            e.get("time") or 0
-        )
-        if isinstance(t, str):
-            try:
-                t = datetime.datetime.fromisoformat(t).timestamp()
-            except Exception:
-                t = 0
-        t_str = datetime.datetime.fromtimestamp(t).strftime("%m-%d %H:%M") if t else "?"
+        t = _event_ts(e)
+        t_str = _format_ts(int(t), "%m-%d %H:%M") if t else "?"
         if (agent and ag != agent) or (event_type and et != event_type):
             continue
         lines.append(f"{t_str}: [{et.upper()}] {ag}")
     return "\n".join(lines)
 
+def _is_failure(obj) -> bool:
+    """
+    True if any key or string value anywhere in the event mentions "fail" (case-insensitive):
+    the same events the old json.dumps(e) substring test matched, without re-serializing.
+    """
+    if isinstance(obj, str):
+        return "fail" in obj.lower()
+    if isinstance(obj, dict):
+        return any(_is_failure(k) or _is_failure(v) for k, v in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return any(_is_failure(v) for v in obj)
+    return False
+
 def risk_report(events, peer_reviews):
+    # Counted per call rather than kept as incremental counters: callers pass different event
+    # sets (the full window, or the session's filtered events), and load_all_events already
+    # reads the journal incrementally, so this is one dict pass over at most `limit` events.
     fail_counts = defaultdict(int)
     rollback_counts = defaultdict(int)
     manual_review_counts = defaultdict(int)
@@ -140,7 +173,7 @@ def risk_report(events, peer_reviews):
         et = e.get("event_type", e.get("type", ""))
         if et == "rollback":
             rollback_counts[ag] += 1
-        if et == "upgrade" and "fail" in json.dumps(e).lower():
+        elif et == "upgrade" and _is_failure(e):
             fail_counts[ag] += 1
     for r in peer_reviews:
         ag = r.get("reviewed_event", {}).get("data", {}).get("agent", "unknown")
@@ -1,8 +1,10 @@
+import ast
 import os
 import time
 import logging
 from functools import lru_cache
 from typing import Any, Dict, List, Optional, Callable, Tuple
+from agent.utils import append_jsonl, get_openai_client, loads_json, tail_lines
 
 try:
     import openai
@@ -26,8 +28,9 @@ OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 GOOGLE_API_URL = "https://generativelanguage.googleapis.com/v1beta/models/"
 
-# Central usage logging for analytics/dashboards
-LLM_USAGE_LOG = "logs/llm_usage_log.json"
+# Central usage logging for analytics/dashboards (one JSON record per line)
+LLM_USAGE_LOG = "logs/llm_usage_log.jsonl"
+LEGACY_LLM_USAGE_LOG = "logs/llm_usage_log.json"  # older records, one per line, read-only
 os.makedirs(os.path.dirname(LLM_USAGE_LOG), exist_ok=True)
 
 def log_usage(provider, model, prompt, tokens, duration, extra=None):
@@ -41,11 +44,17 @@ def log_usage(provider, model, prompt, tokens, duration, extra=None):
         "extra": extra or {},
     }
     try:
-        with open(LLM_USAGE_LOG, "a", encoding="utf-8") as f:
-            f.write(str(data) + "\n")
+        append_jsonl(LLM_USAGE_LOG, data)
     except Exception:
         pass
 
+def _parse_usage_line(line):
+    try:
+        return loads_json(line)
+    except ValueError:
+        # Records written before the log switched to JSON are Python dict reprs
+        return ast.literal_eval(line.decode("utf-8") if isinstance(line, bytes) else line)
+
 # --- Prompt Templating Registry (optional) ---
 PROMPT_TEMPLATES = {
     "default": "{prompt}",
@@ -109,6 +118,11 @@ DEFAULT_LLM_USE_CASE = {
 
 # --- Smart LLM Router ---
 
+@lru_cache(maxsize=8)
+def _anthropic_client(api_key: Optional[str]):
+    """One Anthropic client per key, so its connection pool is reused across calls."""
+    return anthropic.Anthropic(api_key=api_key)
+
 def route_llm(
     prompt: str,
     use_case: str = "default",
@@ -141,7 +155,9 @@ def route_llm(
             if provider == "openai":
                 if openai is None:
                     raise ImportError("openai package not installed.")
-                client = openai.OpenAI(api_key=conf["api_key"])
+                client = get_openai_client(conf["api_key"])
+                if client is None:
+                    raise ImportError("OpenAI client unavailable (httpx missing or no API key).")
                 response = client.chat.completions.create(
                     model=conf["model"],
                     messages=[{"role": "user", "content": real_prompt}],
@@ -163,7 +179,7 @@ def route_llm(
             elif provider == "anthropic":
                 if anthropic is None:
                     raise ImportError("anthropic package not installed.")
-                client = anthropic.Anthropic(api_key=conf["api_key"])
+                client = _anthropic_client(conf["api_key"])
                 completion = client.messages.create(
                     model=conf["model"],
                     messages=[{"role": "user", "content": real_prompt}],
@@ -236,15 +252,14 @@ def available_providers() -> List[str]:
 
 def usage_summary(n=100):
     """Quick analytics for your LLM usage dashboard."""
-    log_path = LLM_USAGE_LOG
     stats = {}
-    if not os.path.exists(log_path):
-        return {}
-    with open(log_path, encoding="utf-8") as f:
-        lines = f.readlines()[-n:]
+    # Only the last n records are read, from the end of the file; the legacy log tops up the window
+    lines = tail_lines(LLM_USAGE_LOG, n)
+    if len(lines) < n:
+        lines = tail_lines(LEGACY_LLM_USAGE_LOG, n - len(lines)) + lines
     for line in lines:
         try:
-            rec = eval(line)
+            rec = _parse_usage_line(line)
             key = (rec["provider"], rec["model"])
             stats.setdefault(key, 0)
             stats[key] += rec.get("tokens", 0)
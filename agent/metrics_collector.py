@@ -1,11 +1,11 @@
 # agent/metrics_collector.py
 
-import json
 from datetime import datetime
 from pathlib import Path
 import threading
 import logging
 from agent.event_bus import publish_event
+from agent.utils import dumps_json
 
 try:
     from agent.root_cause_analytics import analyze_root_causes
@@ -36,7 +36,7 @@ def collect_metrics() -> dict:
     try:
         with LOG_LOCK:
             with open(METRICS_LOG, "a", encoding="utf-8") as f:
-                f.write(json.dumps(metrics) + "\n")
+                f.write(dumps_json(metrics) + "\n")
         logging.info(f"✅ Metrics collected: {metrics}")
         publish_event("metrics_collected", metrics)
     except Exception as e:
@@ -86,7 +86,7 @@ def summarize_metrics_and_root_cause():
     try:
         with LOG_LOCK:
             with open(SUMMARY_LOG, "a", encoding="utf-8") as f:
-                f.write(json.dumps({
+                f.write(dumps_json({
                     "timestamp": datetime.utcnow().isoformat() + "Z",
                     "summary": root_summary,
                     "metrics": metrics,
@@ -11,6 +11,7 @@ from typing import Optional, List, Dict, Any
 from agent.event_bus import (
     publish_event, publish_request, publish_response, start_listener_in_thread
 )
+from agent.utils import append_jsonl, iter_jsonl
 
 try:
     from termcolor import cprint
@@ -24,7 +25,7 @@ except ImportError:
     openai = None
 
 # --- Configuration ---
-PLANNER_LOG_PATH = Path("logs/planner_activity.json")
+PLANNER_LOG_PATH = Path("logs/planner_activity.jsonl")
 BACKUP_ROOT = Path("logs/agent_backups/planner")
 RETRIES = 3
 
@@ -47,27 +48,23 @@ class Planner:
 
     def _log_action(self, action: str, details: Optional[Dict[str, Any]] = None) -> None:
         """
-        Append action log entry to JSON planner activity log.
+        Append action log entry to the JSONL planner activity log.
         """
         try:
-            if PLANNER_LOG_PATH.exists():
-                with open(PLANNER_LOG_PATH, encoding="utf-8") as f:
-                    all_logs = json.load(f)
-            else:
-                all_logs = []
-
             entry = {
                 "timestamp": datetime.datetime.now().isoformat(),
                 "action": action,
                 "details": details or {}
             }
-            all_logs.append(entry)
-
-            with open(PLANNER_LOG_PATH, "w", encoding="utf-8") as f:
-                json.dump(all_logs, f, indent=2)
+            append_jsonl(str(PLANNER_LOG_PATH), entry)
         except Exception as e:
             logging.error(f"Failed to log planner action '{action}': {e}")
 
+    @staticmethod
+    def read_logs():
+        """Yield logged planner actions, oldest first."""
+        return iter_jsonl(str(PLANNER_LOG_PATH))
+
     def list_apps(self) -> None:
         """
         List all available apps/bots.
@@ -310,8 +307,12 @@ def handle_plan_request(event: dict):
     result = {"status": "handled", "details": "plan_request handled by Planner agent."}
     publish_response("plan_result", result, correlation_id=event.get("correlation_id"))
 
-# Start event listener thread for 'plan_request' events
-start_listener_in_thread(handle_plan_request, event_types=["plan_request"])
+def register_event_handlers():
+    """Start the Planner's event-bus listener (a no-op if already running)."""
+    start_listener_in_thread(handle_plan_request, event_types=["plan_request"])
+
+if os.environ.get("AGENT_LISTEN") == "1":
+    register_event_handlers()
 
 if __name__ == "__main__":
     planner = Planner()
@@ -86,10 +86,13 @@ class PluginHotReloader:
         publish_event(event_type, {"plugin": name})
         utils.notify_human(f"[PLUGIN] UNLOADED: {name}")
 
-    def run(self):
+    def run(self, on_ready=None):
         utils.notify_human("[HotReloadDaemon] Monitoring plugins for changes...")
         while True:
             self.scan_plugins()
+            if on_ready is not None:
+                on_ready()  # first scan done: existing plugins are loaded
+                on_ready = None
             time.sleep(self.poll_interval)
 
 def start_plugin_hot_reload_daemon():
@@ -6,31 +6,30 @@ import datetime
 from pathlib import Path
 from typing import List, Dict, Any, Optional, Tuple
 from collections import defaultdict, Counter
+from agent.event_bus import iter_events
+from agent.incident_responder import iter_incidents
 
 EVENTS_DIR = Path("events")
-INCIDENTS_FILE = Path("logs/incident_responder/incident_summaries.json")
 ANALYTICS_LOG = Path("logs/root_cause_analytics")
 ANALYTICS_LOG.mkdir(parents=True, exist_ok=True)
 
 
 def load_events(since: Optional[datetime.datetime] = None) -> List[Dict[str, Any]]:
     """
-    Load event JSON files from EVENTS_DIR filtered by timestamp >= since.
+    Load events from the event bus journal filtered by timestamp >= since.
     """
     events = []
     if not EVENTS_DIR.exists():
         print(f"[RootCauseAnalytics] Events directory {EVENTS_DIR} does not exist.")
         return events
-    for file in sorted(EVENTS_DIR.glob("event_*.json")):
+    for event in iter_events():
         try:
-            with open(file, encoding="utf-8") as f:
-                event = json.load(f)
             event_time = datetime.datetime.fromtimestamp(event.get("timestamp", 0))
             if not since or event_time >= since:
                 event["event_time"] = event_time
                 events.append(event)
         except Exception as e:
-            print(f"[RootCauseAnalytics] Failed to load event {file}: {e}")
+            print(f"[RootCauseAnalytics] Failed to load event: {e}")
     return events
 
 
@@ -38,11 +37,8 @@ def load_incidents(since: Optional[datetime.datetime] = None) -> List[Dict[str,
     """
     Load incident summaries filtered by detected_at >= since.
     """
-    if not INCIDENTS_FILE.exists():
-        return []
     try:
-        with open(INCIDENTS_FILE, encoding="utf-8") as f:
-            data = json.load(f)
+        data = list(iter_incidents())
         if since:
             data = [
                 i for i in data
@@ -26,7 +26,7 @@ try:
 except ImportError:
     client = None
 
-CENTRAL_TEST_LOG = "logs/test_runs.json"
+CENTRAL_TEST_LOG = "logs/test_runs.jsonl"
 BACKUP_ROOT = "logs/agent_backups"
 
 class Tester:
@@ -154,8 +154,8 @@ class Tester:
         try:
             mem = {}
             if os.path.exists(mem_path):
-                with open(mem_path, encoding="utf-8") as mf:
-                    mem = json.load(mf)
+                with open(mem_path, "rb") as mf:
+                    mem = utils.loads_json(mf.read())
             if "test_runs" not in mem:
                 mem["test_runs"] = []
             mem["test_runs"].append(
@@ -165,8 +165,7 @@ class Tester:
                     "coverage_analysis": coverage_analysis[:2000],
                 }
             )
-            with open(mem_path, "w", encoding="utf-8") as mf:
-                json.dump(mem, mf, indent=2)
+            utils.atomic_write_bytes(mem_path, utils.dumps_json_bytes(mem))
         except Exception as e:
             publish_event('error', {'agent': 'tester', 'error': str(e), 'timestamp': datetime.datetime.now().isoformat()})
             logging.error(f"Error updating memory: {e}")
@@ -231,12 +230,7 @@ class Tester:
     @staticmethod
     def save_test_run_central(app_name: str, test_ok: bool, coverage: str, static_logs: Dict[str, Any], test_out: str):
         os.makedirs(os.path.dirname(CENTRAL_TEST_LOG), exist_ok=True)
-        if os.path.exists(CENTRAL_TEST_LOG):
-            with open(CENTRAL_TEST_LOG, encoding="utf-8") as f:
-                all_logs = json.load(f)
-        else:
-            all_logs = []
-        all_logs.append({
+        utils.append_jsonl(CENTRAL_TEST_LOG, {
             "app": app_name,
             "timestamp": datetime.datetime.now().isoformat(),
             "test_ok": test_ok,
@@ -244,8 +238,11 @@ class Tester:
             "static_logs": static_logs,
             "test_out": test_out[:2000]
         })
-        with open(CENTRAL_TEST_LOG, "w", encoding="utf-8") as f:
-            json.dump(all_logs, f, indent=2)
+
+    @staticmethod
+    def read_test_runs():
+        """Yield central test-run records, oldest first."""
+        return utils.iter_jsonl(CENTRAL_TEST_LOG)
 
 # EventBus handler for test requests
 def handle_test_request(event):
@@ -267,7 +264,12 @@ def main_entry():
     else:
         print("❌ Some tests failed.")
 
-start_listener_in_thread(handle_test_request, event_types=["test_request"])
+def register_event_handlers():
+    """Start the Tester's event-bus listener (a no-op if already running)."""
+    start_listener_in_thread(handle_test_request, event_types=["test_request"])
+
+if os.environ.get("AGENT_LISTEN") == "1":
+    register_event_handlers()
 
 if __name__ == "__main__":
     main_entry()
@@ -0,0 +1,33 @@
+# agent/testrun_cache.py
+
+import logging
+from pathlib import Path
+from typing import Dict, Tuple
+
+from agent.tester import Tester
+from agent.utils import source_tree_hash
+
+APPS_ROOT = Path(__file__).parent.parent / "apps"
+
+class TestRunCache:
+    """
+    Tester.run_tests results for the span of one health_check or doctor call.
+    A re-run is skipped while the app's *.py files are unchanged since the recorded run,
+    e.g. when a heal attempt left the code as it was.
+    """
+
+    def __init__(self):
+        self._results: Dict[str, Tuple[str, bool]] = {}
+
+    def run_tests(self, app_name: str) -> bool:
+        app_dir = APPS_ROOT / app_name
+        sig = source_tree_hash(app_dir)
+        hit = self._results.get(app_name)
+        if hit and hit[0] == sig:
+            logging.info(f"Sources unchanged since the last run for {app_name}: passed={hit[1]}")
+            return hit[1]
+        passed = bool(Tester.run_tests(app_name))
+        # Only record a result if the run itself left the sources untouched
+        if source_tree_hash(app_dir) == sig:
+            self._results[app_name] = (sig, passed)
+        return passed
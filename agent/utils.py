@@ -2,10 +2,24 @@
 
 import os
 import json
+import shutil
+import hashlib
 import logging
 import datetime
+import sqlite3
+import atexit
+import tempfile
+from functools import lru_cache
+from pathlib import Path
 from typing import Optional
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+LLM_CACHE_PATH = "logs/llm_cache.sqlite"
+
 def safe_import(module_name: str, fallback=None):
     try:
         mod = __import__(module_name)
@@ -25,20 +39,176 @@ def load_json_file(path: str, default=None):
         default = {}
     try:
         if os.path.exists(path):
-            with open(path, "r", encoding="utf-8") as f:
-                return json.load(f)
+            with open(path, "rb") as f:
+                return loads_json(f.read())
     except Exception as e:
         logging.error(f"Failed to load JSON from {path}: {e}")
     return default
 
+def atomic_write_bytes(path: str, data: bytes) -> None:
+    """Write to a temp file in the same directory, then os.replace it over path."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        try:
+            os.chmod(tmp, os.stat(path).st_mode & 0o777)
+        except FileNotFoundError:
+            os.chmod(tmp, 0o644)  # mkstemp creates files 0600
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
 def save_json_file(path: str, data):
     try:
         os.makedirs(os.path.dirname(path), exist_ok=True)
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
+        atomic_write_bytes(path, dumps_json_bytes(data, indent=True))
     except Exception as e:
         logging.error(f"Failed to save JSON to {path}: {e}")
 
+def loads_json(data):
+    """Parse JSON from str/bytes, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def dumps_json(data, indent: bool = False) -> str:
+    """Serialize to a JSON string, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else 0).decode("utf-8")
+    return json.dumps(data, indent=2 if indent else None)
+
+def dumps_json_bytes(data, indent: bool = False) -> bytes:
+    """Serialize to UTF-8 JSON bytes for binary-mode writes, skipping the str round-trip."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(data, indent=2 if indent else None).encode("utf-8")
+
+_APPENDED_PATHS = set()
+
+def _fsync_appended() -> None:
+    """Flush appended JSONL logs to disk once, at interpreter exit."""
+    for path in _APPENDED_PATHS:
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            continue
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+atexit.register(_fsync_appended)
+
+def append_jsonl(path: str, entry) -> None:
+    """Append one compact JSON record as a line; O(1) regardless of log size."""
+    if orjson is not None:
+        line = orjson.dumps(entry, option=orjson.OPT_APPEND_NEWLINE)
+    else:
+        line = (json.dumps(entry, separators=(",", ":")) + "\n").encode("utf-8")
+    with open(path, "ab") as f:
+        f.write(line)
+    _APPENDED_PATHS.add(path)
+
+def iter_jsonl(path: str):
+    """Yield records from a JSON-Lines file, skipping blank or corrupt lines."""
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return
+    with f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield loads_json(line)
+            except ValueError as e:
+                logging.warning(f"Skipping corrupt line in {path}: {e}")
+
+def tail_lines(path: str, n: int, block_size: int = 64 * 1024) -> list:
+    """
+    Return the last n non-blank lines of a file as bytes, oldest first, reading backwards
+    in block_size chunks so cost depends on n rather than on file size.
+    """
+    if n <= 0:
+        return []
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return []
+    with f:
+        pos = f.seek(0, os.SEEK_END)
+        data = b""
+        while pos > 0 and data.count(b"\n") <= n:
+            step = min(block_size, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+    lines = data.splitlines()
+    if pos > 0:
+        lines = lines[1:]  # the window starts mid-line
+    lines = [line for line in lines if line.strip()]
+    return lines[-n:]
+
+def tail_jsonl(path: str, n: int, block_size: int = 8192) -> list:
+    """Return the last n records of a JSON-Lines file, oldest first (see tail_lines)."""
+    records = []
+    for line in tail_lines(path, n, block_size):
+        try:
+            records.append(loads_json(line))
+        except ValueError:
+            continue  # corrupt record
+    return records
+
+def source_tree_hash(root, pattern: str = "*.py") -> str:
+    """
+    BLAKE2b over (relative path, mtime_ns, size) of every file matching pattern under root.
+    Stat-only, so it is cheap; changes whenever a matching file is added, removed or touched.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    root = os.fspath(root)
+    for path in sorted(Path(root).rglob(pattern)):
+        st = path.stat()
+        h.update(f"{os.path.relpath(path, root)}\0{st.st_mtime_ns}\0{st.st_size}\n".encode("utf-8"))
+    return h.hexdigest()
+
+def fast_copy(src, dst, buffer_size: int = 256 * 1024) -> None:
+    """
+    Copy src to dst in-kernel where possible: copy_file_range (reflink / server-side copy on
+    filesystems that support it), then sendfile, then a buffered userspace copy.
+    """
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        in_fd, out_fd = fsrc.fileno(), fdst.fileno()
+        size = os.fstat(in_fd).st_size
+        strategies = []
+        if hasattr(os, "copy_file_range"):
+            strategies.append(lambda off: os.copy_file_range(in_fd, out_fd, size - off, off, off))
+        if hasattr(os, "sendfile"):
+            strategies.append(lambda off: os.sendfile(out_fd, in_fd, off, size - off))
+        for copy_chunk in strategies:
+            copied = 0
+            try:
+                while copied < size:
+                    n = copy_chunk(copied)
+                    if n == 0:
+                        break
+                    copied += n
+            except OSError:
+                pass
+            if copied == size:
+                return
+            fdst.seek(0)
+            fdst.truncate()
+        fsrc.seek(0)
+        shutil.copyfileobj(fsrc, fdst, buffer_size)
+
 def backup_file(file_path: str, backup_root: str, max_backups: int = 5) -> Optional[str]:
     import shutil
     from pathlib import Path
@@ -61,6 +231,28 @@ def backup_file(file_path: str, backup_root: str, max_backups: int = 5) -> Optio
     logging.info(f"Backup created for {file_path} at {backup_file}")
     return str(backup_file)
 
+def get_openai_client(api_key: Optional[str] = None):
+    """
+    Shared OpenAI client whose HTTP connections are pooled and kept alive across calls.
+    Returns None if the SDK is missing or no API key is available.
+    The environment is read on every call, so a key loaded after import is still found.
+    """
+    return _openai_client(api_key or os.environ.get("OPENAI_API_KEY"))
+
+@lru_cache(maxsize=None)
+def _openai_client(api_key: Optional[str]):
+    try:
+        import httpx
+        import openai
+    except ImportError:
+        return None
+    if not api_key:
+        return None
+    return openai.OpenAI(
+        api_key=api_key,
+        http_client=httpx.Client(limits=httpx.Limits(max_keepalive_connections=32)),
+    )
+
 def llm_call(client, prompt: str, model: str = "gpt-4o", max_tokens: int = 1500, temperature: float = 0.1):
     try:
         response = client.chat.completions.create(
@@ -73,3 +265,69 @@ def llm_call(client, prompt: str, model: str = "gpt-4o", max_tokens: int = 1500,
     except Exception as e:
         logging.error(f"LLM call failed: {e}")
         return None
+
+def _llm_cache_connect() -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(LLM_CACHE_PATH), exist_ok=True)
+    conn = sqlite3.connect(LLM_CACHE_PATH, timeout=30)
+    conn.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, text TEXT)")
+    return conn
+
+def llm_cached(create, prompt: str, model: str = "gpt-4o", max_tokens: int = 1500,
+               temperature: float = 0.1, force: bool = False, stream_to=None) -> str:
+    """
+    Chat completion through `create` (e.g. client.chat.completions.create), cached on disk
+    by SHA256 of (model, temperature, max_tokens, prompt). Pass force=True to re-sample and refresh
+    the entry. With `stream_to` (a writable text stream), a cache miss is streamed and echoed as it
+    arrives; a cache hit is written to it whole.
+    """
+    key = hashlib.sha256(f"{model}|{temperature}|{max_tokens}|{prompt}".encode("utf-8")).hexdigest()
+    if not force:
+        try:
+            with _llm_cache_connect() as conn:
+                row = conn.execute("SELECT text FROM responses WHERE key = ?", (key,)).fetchone()
+            if row:
+                if stream_to is not None:
+                    stream_to.write(row[0] + "\n")
+                    stream_to.flush()
+                return row[0]
+        except sqlite3.Error as e:
+            logging.warning(f"LLM cache lookup failed: {e}")
+
+    resp = create(
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+        max_tokens=max_tokens,
+        temperature=temperature,
+        stream=stream_to is not None,
+    )
+    if stream_to is None:
+        text = resp.choices[0].message.content
+    else:
+        parts = []
+        for chunk in resp:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                parts.append(delta)
+                stream_to.write(delta)
+                stream_to.flush()
+        stream_to.write("\n")
+        text = "".join(parts)
+    try:
+        with _llm_cache_connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO responses (key, text) VALUES (?, ?)", (key, text))
+    except sqlite3.Error as e:
+        logging.warning(f"LLM cache store failed: {e}")
+    return text
+
+def pretty_json_file(path: str) -> str:
+    """Re-indent a compact JSON or JSON-Lines log for human viewing."""
+    if path.endswith(".jsonl"):
+        return "\n".join(dumps_json(rec, indent=True) for rec in iter_jsonl(path))
+    return dumps_json(load_json_file(path), indent=True)
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) == 3 and sys.argv[1] == "--pretty":
+        print(pretty_json_file(sys.argv[2]))
+    else:
+        print("Usage: python -m agent.utils --pretty <log.json|log.jsonl>")
@@ -14,11 +14,11 @@ from prompt_toolkit.completion import WordCompleter
 from prompt_toolkit.formatted_text import HTML
 
 # === Core and Agent Imports ===
-from agent.planner import Planner
-from agent.coder import Coder
-from agent.tester import Tester
-from agent.deployer import Deployer
-from agent.feedback import Feedback
+from agent.planner import Planner, register_event_handlers as register_planner_event_handlers
+from agent.coder import Coder, register_event_handlers as register_coder_event_handlers
+from agent.tester import Tester, register_event_handlers as register_tester_event_handlers
+from agent.deployer import Deployer, register_event_handlers as register_deployer_event_handlers
+from agent.feedback import Feedback, register_event_handlers as register_feedback_event_handlers
 
 from agent.devops_fixer import main_entry as devops_fixer_main
 from agent.health import health_check, doctor
@@ -160,6 +160,11 @@ def main():
     os.system('cls' if os.name == 'nt' else 'clear')
     onboarding(force=False)
     threading.Thread(target=periodic_save, daemon=True).start()
+    register_planner_event_handlers()
+    register_coder_event_handlers()
+    register_tester_event_handlers()
+    register_deployer_event_handlers()
+    register_feedback_event_handlers()
     session = PromptSession()
     completer = get_menu_completer()
     last_choice = None
@@ -220,7 +225,7 @@ def main():
             elif idx == 4:
                 log_dir = "logs"
                 if not os.path.exists(log_dir): os.makedirs(log_dir)
-                logs = [f for f in os.listdir(log_dir) if f.endswith(".log") or f.endswith(".md") or f.endswith(".json")]
+                logs = [f for f in os.listdir(log_dir) if f.endswith(".log") or f.endswith(".md") or f.endswith(".json") or f.endswith(".jsonl")]
                 if logs:
                     last_log = sorted(logs)[-1]
                     cprint(f"\n--- Last Log: {last_log} ---", "cyan")